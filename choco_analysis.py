@@ -1,7 +1,18 @@
 import streamlit as st
-import sqlite3
 import pandas as pd
 import altair as alt
+import tempfile
+import threading
+import time
+
+from choco_console import MAX_BYTES, MAX_HEAVY_QUERIES, MAX_ROWS, TIME_BUDGET_S, QueryCancelled, submit
+from choco_db import DB_PATH, ConnectionPool, QueryCache
+from choco_export import EXPORT_FORMATS, export, fetch_page, table_columns
+from choco_perf import PerfRecorder, setup_logging
+from choco_pushdown import PushdownEngine
+from choco_queries import queries
+from choco_rollups import ROLLUPS, rollups_fresh
+from choco_snapshot import SNAPSHOT_TABLES, ColumnarSnapshot, current_snapshot_name
 
 # ----------------- Streamlit Page Setup -----------------
 st.set_page_config(page_title="ChocoCrunch Analytics 🍫", layout="wide")
@@ -11,138 +22,91 @@ Explore the *ChocoCrunch* database!
 You can run SQL queries on the tables: **product_info**, **nutrient_info**, and **derived_metrics**.
 """)
 
-# ----------------- Connect / Create Database -----------------
-conn = sqlite3.connect("chocolates.db")
-
-# ----------------- Predefined Queries -----------------
-queries = {
-    "product_info": {
-        "count_products_per_brand": {
-            "question": "How many products are there per brand?",
-            "sql": "SELECT brand, COUNT(*) AS product_count FROM product_info GROUP BY brand;"
-        },
-        "count_unique_products_per_brand": {
-            "question": "How many unique products does each brand have?",
-            "sql": "SELECT brand, COUNT(DISTINCT product_name) AS unique_products FROM product_info GROUP BY brand;"
-        },
-        "top5_brands_by_product_count": {
-            "question": "Which are the top 5 brands by product count?",
-            "sql": "SELECT brand, COUNT(*) AS product_count FROM product_info GROUP BY brand ORDER BY product_count DESC LIMIT 5;"
-        },
-        "products_missing_name": {
-            "question": "Which products have missing product names?",
-            "sql": "SELECT * FROM product_info WHERE product_name IS NULL OR product_name = '';"
-        },
-        "unique_brand_count": {
-            "question": "How many unique brands are there?",
-            "sql": "SELECT COUNT(DISTINCT brand) AS unique_brands FROM product_info;"
-        },
-        "products_code_starting_3": {
-            "question": "Which products have a code starting with '3'?",
-            "sql": "SELECT * FROM product_info WHERE product_code LIKE '3%';"
-        }
-    },
-
-    "nutrient_info": {
-        "top10_highest_energy": {
-            "question": "What are the top 10 products with the highest energy (kcal)?",
-            "sql": "SELECT product_name, energy_kcal_value FROM nutrient_info ORDER BY energy_kcal_value DESC LIMIT 10;"
-        },
-        "avg_sugars_per_nova": {
-            "question": "What is the average sugar content per nova-group?",
-            "sql": "SELECT nova_group, AVG(sugars_value) AS avg_sugars FROM nutrient_info GROUP BY nova_group;"
-        },
-        "count_fat_gt20": {
-            "question": "How many products have fat content greater than 20g?",
-            "sql": "SELECT COUNT(*) AS high_fat_products FROM nutrient_info WHERE fat_value > 20;"
-        },
-        "avg_carbs_per_product": {
-            "question": "What is the average carbohydrate content per product?",
-            "sql": "SELECT AVG(carbohydrates_value) AS avg_carbs FROM nutrient_info;"
-        },
-        "products_sodium_gt1g": {
-            "question": "Which products have sodium content greater than 1g?",
-            "sql": "SELECT product_name, sodium_value FROM nutrient_info WHERE sodium_value > 1;"
-        },
-        "count_nonzero_fvn": {
-            "question": "How many products have non-zero fruits/vegetables/nuts content?",
-            "sql": "SELECT COUNT(*) AS nonzero_fvn FROM nutrient_info WHERE fruits_vegetables_nuts_value > 0;"
-        },
-        "products_energy_gt500": {
-            "question": "Which products have energy greater than 500 kcal?",
-            "sql": "SELECT product_name, energy_kcal_value FROM nutrient_info WHERE energy_kcal_value > 500;"
-        }
-    },
-        
-
-    "derived_metrics": {
-        "count_per_calorie_category": {
-            "question": "How many products are there per calorie category?",
-            "sql": "SELECT calorie_category, COUNT(*) AS product_count FROM derived_metrics GROUP BY calorie_category;"
-        },
-        "count_high_sugar": {
-            "question": "How many products are marked as High Sugar?",
-            "sql": "SELECT COUNT(*) AS high_sugar_count FROM derived_metrics WHERE sugar_category = 'High Sugar';"
-        },
-        "avg_ratio_high_calorie": {
-            "question": "What is the average sugar-to-carb ratio for High Calorie products?",
-            "sql": "SELECT AVG(sugar_to_carb_ratio) AS avg_ratio FROM derived_metrics WHERE calorie_category = 'High Calorie';"
-        },
-        "high_calorie_and_high_sugar": {
-            "question": "Which products are both High Calorie and High Sugar?",
-            "sql": "SELECT * FROM derived_metrics WHERE calorie_category = 'High Calorie' AND sugar_category = 'High Sugar';"
-        },
-        "count_ultra_processed": {
-            "question": "How many products are marked as ultra-processed?",
-            "sql": "SELECT COUNT(*) AS ultra_processed_count FROM derived_metrics WHERE ultra_processed = 1;"
-        },
-        "products_ratio_gt07": {
-            "question": "Which products have sugar-to-carb ratio greater than 0.7?",
-            "sql": "SELECT * FROM derived_metrics WHERE sugar_to_carb_ratio > 0.7;"
-        },
-        "avg_ratio_per_calorie_category": {
-            "question": "What is the average sugar-to-carb ratio per calorie category?",
-            "sql": "SELECT calorie_category, AVG(sugar_to_carb_ratio) AS avg_ratio FROM derived_metrics GROUP BY calorie_category;"
-        }
-    },
-
-    "join_queries": {
-        "top5_brands_high_calorie": {
-            "question": "Which are the top 5 brands with the most High Calorie products?",
-            "sql": "SELECT p.brand, COUNT(*) AS high_calorie_count FROM product_info p JOIN derived_metrics d ON p.product_id = d.product_id WHERE d.calorie_category = 'High Calorie' GROUP BY p.brand ORDER BY high_calorie_count DESC LIMIT 5;"
-        },
-        "avg_energy_per_calorie_category": {
-            "question": "What is the average energy (kcal) for each calorie category?",
-            "sql": "SELECT d.calorie_category, AVG(n.energy_kcal_value) AS avg_energy FROM derived_metrics d JOIN nutrient_info n ON d.product_id = n.product_id GROUP BY d.calorie_category;"
-        },
-        "ultra_processed_per_brand": {
-            "question": "How many ultra-processed products are there per brand?",
-            "sql": "SELECT p.brand, COUNT(*) AS ultra_processed_count FROM product_info p JOIN derived_metrics d ON p.product_id = d.product_id WHERE d.ultra_processed = 1 GROUP BY p.brand;"
-        },
-        "high_sugar_high_calorie_with_brand": {
-            "question": "Which products are both High Sugar and High Calorie, along with their brand?",
-            "sql": "SELECT p.brand, p.product_name FROM product_info p JOIN derived_metrics d ON p.product_id = d.product_id WHERE d.calorie_category = 'High Calorie' AND d.sugar_category = 'High Sugar';"
-        },
-        "avg_sugar_ultra_processed_per_brand": {
-            "question": "What is the average sugar content per brand for ultra-processed products?",
-            "sql": "SELECT p.brand, AVG(n.sugars_value) AS avg_sugar FROM product_info p JOIN nutrient_info n ON p.product_id = n.product_id JOIN derived_metrics d ON p.product_id = d.product_id WHERE d.ultra_processed = 1 GROUP BY p.brand;"
-        },
-        "fvn_per_calorie_category": {
-            "question": "How many products with fruits/vegetables/nuts content exist in each calorie category?",
-            "sql": "SELECT d.calorie_category, COUNT(*) AS count_with_fvn FROM derived_metrics d JOIN nutrient_info n ON d.product_id = n.product_id WHERE n.fruits_vegetables_nuts_value > 0 GROUP BY d.calorie_category;"
-        },
-        "top5_products_by_ratio": {
-            "question": "Which are the top 5 products by sugar-to-carb ratio, with their calorie and sugar category?",
-            "sql": "SELECT p.product_name, d.sugar_to_carb_ratio, d.calorie_category, d.sugar_category FROM product_info p JOIN derived_metrics d ON p.product_id = d.product_id ORDER BY d.sugar_to_carb_ratio DESC LIMIT 5;"
-        }
-    }
-}
-
-# ----------------- Tabs Layout -----------------
-tab1, tab2, tab3, tab4 = st.tabs(["🔎 Queries", "📋 Tables", "📈 EDA Insights", "🔗 Compare Tables"])
+# ----------------- Shared Connection Pool & Query Cache -----------------
+@st.cache_resource
+def get_pool():
+    return ConnectionPool(DB_PATH)
+
+@st.cache_resource
+def get_perf():
+    setup_logging()
+    return PerfRecorder(get_pool())
+
+@st.cache_resource
+def get_query_cache():
+    return QueryCache(get_pool(), observer=get_perf().on_query)
+
+perf = get_perf()
+query_cache = get_query_cache()
+engine = PushdownEngine(query_cache.run, stream=query_cache.stream, memo=query_cache.memo)
+
+# ----------------- Performance Sidebar -----------------
+show_perf = st.sidebar.checkbox("⏱️ Performance panel", key="perf_panel")
+
+# ----------------- Columnar Snapshot -----------------
+# Keyed by snapshot name, so a newly published snapshot is mapped once and
+# shared by every session; the old one is released when it falls out.
+@st.cache_resource(max_entries=1)
+def get_snapshot(name):
+    try:
+        return ColumnarSnapshot(name=name)
+    except (ImportError, FileNotFoundError):
+        return None
+
+def read_columns(table, columns):
+    # point-level reads come from the memory-mapped snapshot when it matches
+    # the live database, otherwise from SQLite
+    name = current_snapshot_name()
+    snapshot = get_snapshot(name) if name and table in SNAPSHOT_TABLES else None
+    if snapshot is not None and snapshot.is_current(DB_PATH):
+        with perf.span("query", f"snapshot {table}", cache="snapshot") as info:
+            df = snapshot.read_columns(table, columns)
+            info["rows"], info["bytes"] = len(df), int(df.memory_usage(deep=True).sum())
+        return df
+    return engine.read_columns(table, columns)
+
+# ----------------- Page Navigation -----------------
+# Only the selected page runs, so hidden views do no I/O or chart building.
+PAGE_NAMES = ["🔎 Queries", "🧪 SQL Console", "📋 Tables", "📈 EDA Insights", "🔗 Compare Tables"]
+active_page = st.radio("Page", PAGE_NAMES, horizontal=True, key="active_page",
+                       label_visibility="collapsed")
+
+# bookkeeping tables stay out of the table pickers (the SQL console can still read them)
+INTERNAL_TABLES = {"product_sync", "rollup_state", *ROLLUPS}
+
+def get_table_names():
+    tables = query_cache.run("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%';")
+    return [name for name in tables["name"] if name not in INTERNAL_TABLES]
+
+# ----------------- On-Demand Export -----------------
+# Nothing is exported until the user asks; rows are then streamed from SQLite
+# in fixed-size chunks into a temp file instead of building a DataFrame + CSV copy.
+def export_section(sql, file_stem, key, declared=None):
+    c1, c2 = st.columns([1, 3])
+    with c1:
+        fmt = st.selectbox("Export format", list(EXPORT_FORMATS), key=f"{key}_fmt")
+    if st.button("📦 Prepare download", key=f"{key}_prepare"):
+        spec = EXPORT_FORMATS[fmt]
+        try:
+            with tempfile.TemporaryFile() as tmp:
+                with st.spinner("Exporting..."), perf.span("export", f"{fmt} {file_stem}") as info:
+                    with get_pool().connection() as conn:
+                        n = export(conn, sql, tmp, fmt, declared=declared)
+                    info["rows"], info["bytes"] = n, tmp.tell()
+                # download_button accepts bytes but not a TemporaryFile object
+                tmp.seek(0)
+                st.download_button(
+                    f"⬇️ Download {file_stem}.{spec['ext']} ({n:,} rows)",
+                    data=tmp.read(),
+                    file_name=f"{file_stem}.{spec['ext']}",
+                    mime=spec["mime"],
+                    key=f"{key}_download"
+                )
+        except Exception as e:
+            st.error(f"❌ Error exporting data:\n\n{e}")
 
 # ----------------- Queries Tab -----------------
-with tab1:
+def render_queries_page():
     st.subheader("Run a Query")
     query_type = st.selectbox("Choose a query category:", list(queries.keys()))
     query_choice = st.selectbox(
@@ -154,10 +118,25 @@ with tab1:
 
     st.markdown(f"**❓ Question:** {query['question']}")
     st.code(query["sql"], language="sql")
+    # aggregate questions are answered from the small rollup tables, but only
+    # while those are known to match the base tables
+    served_sql = query["sql"]
+    if "rollup" in query:
+        with get_pool().connection() as conn:
+            fresh = rollups_fresh(conn)
+        if fresh:
+            served_sql = query["rollup"]
+            st.caption("⚡ Served from a precomputed rollup table.")
+        else:
+            st.caption("Rollup tables are missing or out of date; running the base query.")
 
     if st.button("▶️ Execute Query"):
+        st.session_state["executed_query"] = (query_type, query_choice)
+
+    # keep showing the result across reruns (e.g. when preparing a download)
+    if st.session_state.get("executed_query") == (query_type, query_choice):
         try:
-            query_df = pd.read_sql_query(query["sql"], conn)
+            query_df = query_cache.run(served_sql)
 
             if query_df.empty:
                 st.warning("✅ Query executed successfully, but returned no rows.")
@@ -167,184 +146,175 @@ with tab1:
 
                 # Simple visualization logic
                 if query_df.shape[1] >= 2:
-                    col1, col2 = query_df.columns[:2]
-                    chart = alt.Chart(query_df).mark_bar().encode(
-                        x=alt.X(col1, sort='-y'),
-                        y=col2,
-                        tooltip=list(query_df.columns)
-                    )
-                    st.altair_chart(chart, use_container_width=True)
+                    with perf.span("chart", "query_result_bar", rows=len(query_df)):
+                        col1, col2 = query_df.columns[:2]
+                        chart = alt.Chart(query_df).mark_bar().encode(
+                            x=alt.X(col1, sort='-y'),
+                            y=col2,
+                            tooltip=list(query_df.columns)
+                        )
+                        st.altair_chart(chart, use_container_width=True)
 
                 # Download option
-                csv = query_df.to_csv(index=False).encode("utf-8")
-                st.download_button("⬇️ Download Results as CSV", data=csv,
-                                   file_name=f"{query_choice}.csv", mime="text/csv")
+                export_section(served_sql, query_choice, key="query_export")
         except Exception as e:
             st.error(f"❌ Error executing query:\n\n{e}")
+
 # ----------------- Tables Tab -----------------
-with tab2:
+RAW_PAGE_SIZE = 100
+
+def render_tables_page():
     st.subheader("📋 Explore Raw Tables")
 
-    tables = pd.read_sql_query("SELECT name FROM sqlite_master WHERE type='table';", conn)
-    table_names = tables["name"].tolist()
+    table_names = get_table_names()
 
     selected_table = st.selectbox("Choose a table to view:", table_names, key="raw_table")
 
     if selected_table:
-        df = pd.read_sql_query(f"SELECT * FROM {selected_table} LIMIT 100;", conn)
-        st.markdown(f"**Showing first 100 rows of `{selected_table}`**")
+        with get_pool().connection() as conn:
+            declared = dict(table_columns(conn, selected_table))
+        key = "product_code" if "product_code" in declared else "rowid"
+
+        # Keyset pagination: remember the cursor that starts each visited page
+        stack_key = f"page_stack_{selected_table}"
+        stack = st.session_state.setdefault(stack_key, [None])
+        with get_pool().connection() as conn, perf.span("query", f"page of {selected_table}") as info:
+            columns, rows, next_cursor = fetch_page(conn, selected_table, stack[-1], RAW_PAGE_SIZE, key)
+            info["rows"] = len(rows)
+        df = pd.DataFrame(rows, columns=columns)
+
+        page_no = len(stack)
+        st.markdown(f"**Page {page_no} of `{selected_table}` ({RAW_PAGE_SIZE} rows per page, ordered by `{key}`)**")
         st.dataframe(df, use_container_width=True)
 
+        p1, p2, _ = st.columns([1, 1, 6])
+        with p1:
+            if st.button("⬅️ Previous", disabled=page_no == 1, key="raw_prev"):
+                stack.pop()
+                st.rerun()
+        with p2:
+            if st.button("Next ➡️", disabled=next_cursor is None, key="raw_next"):
+                stack.append(next_cursor)
+                st.rerun()
+
         # Download full table
-        full_df = pd.read_sql_query(f"SELECT * FROM {selected_table};", conn)
-        csv = full_df.to_csv(index=False).encode("utf-8")
-        st.download_button(
-            f"⬇️ Download {selected_table} as CSV",
-            data=csv,
-            file_name=f"{selected_table}.csv",
-            mime="text/csv"
-        )
+        export_section(f"SELECT * FROM {selected_table};", selected_table,
+                       key="table_export", declared=declared)
 
 # ----------------- EDA Insights Tab -----------------
-import plotly.express as px
 import numpy as np
 
-# ----------------- Styling & Helpers -----------------
-PALETTE = px.colors.qualitative.Vivid  # Alt options: Bold, D3, Set3
-BG_COLOR = "#0f1116"  # for dark vibes; switch to white for light
-PRIMARY = "#7c3aed"   # purple accent
-ACCENT = "#22d3ee"    # cyan accent
+from choco_charts import (box_summary_figure, box_violin_figures, category_figure, correlation_figure,
+                          density_figure, distribution_figure, missingness_figure, scatter_figure,
+                          violin_figure)
 
+# ----------------- Helpers -----------------
 def kpi_metric(label, value, help_text=None):
     st.metric(label, value)
     if help_text:
         st.caption(help_text)
 
-def numeric_columns(df):
-    return df.select_dtypes(include="number").columns.tolist()
-
-def categorical_columns(df):
-    return df.select_dtypes(include=["object", "category"]).columns.tolist()
-
 def nice_number(n):
     return f"{n:,.0f}" if isinstance(n, (int, np.integer)) else f"{n:,.2f}"
 
-def show_missingness(df):
-    nulls = df.isnull().sum().sort_values(ascending=False)
-    nulls = nulls[nulls > 0]
-    if nulls.empty:
+# The aggregate helpers take a table name: the work runs inside SQLite via the
+# push-down engine and only the aggregated result is transferred to pandas.
+# Figures are built in choco_charts so the benchmark suite can time them too.
+@perf.timed()
+def show_missingness(table):
+    fig = missingness_figure(engine, table)
+    if fig is None:
         st.success("No missing values detected.")
         return
-    miss_df = nulls.reset_index()
-    miss_df.columns = ["column", "missing_count"]
-    miss_df["missing_pct"] = (miss_df["missing_count"] / len(df)) * 100
     st.markdown("**Missingness by column**")
-    fig = px.bar(
-        miss_df,
-        x="column", y="missing_pct",
-        color="missing_pct",
-        color_continuous_scale="Turbo",
-        labels={"missing_pct": "Missing (%)"},
-        height=350
-    )
-    fig.update_layout(margin=dict(l=10, r=10, t=10, b=10), showlegend=False)
     st.plotly_chart(fig, use_container_width=True)
 
-def show_correlation(df, title="Correlation heatmap"):
-    num_cols = numeric_columns(df)
-    if len(num_cols) < 2:
+@perf.timed()
+def show_correlation(table, title="Correlation heatmap"):
+    fig = correlation_figure(engine, table, title)
+    if fig is None:
         st.info("Not enough numeric columns for correlation.")
         return
-    corr = df[num_cols].corr()
-    fig = px.imshow(
-        corr,
-        text_auto=True,
-        color_continuous_scale="RdBu",
-        aspect="auto",
-        title=title
-    )
-    fig.update_layout(margin=dict(l=10, r=10, t=40, b=10))
     st.plotly_chart(fig, use_container_width=True)
 
-def dist_grid(df, num_cols, bins=30, max_cols=6):
+@perf.timed()
+def dist_grid(table, num_cols, bins=30, max_cols=6):
     if not num_cols:
         st.info("No numeric columns found.")
         return
-    cols = num_cols[:max_cols]
     st.markdown("**Distributions**")
-    for col in cols:
-        fig = px.histogram(
-            df, x=col, nbins=bins,
-            marginal="rug",
-            color_discrete_sequence=[PRIMARY],
-            title=f"Distribution of {col}"
-        )
-        fig.update_layout(margin=dict(l=10, r=10, t=40, b=10))
-        st.plotly_chart(fig, use_container_width=True)
+    for col in num_cols[:max_cols]:
+        st.plotly_chart(distribution_figure(engine, table, col, bins), use_container_width=True)
 
-def categorical_bar(df, cat_col, top_n=20, metric_col=None, agg="count"):
-    if agg == "count" or metric_col is None:
-        g = df.groupby(cat_col).size().reset_index(name="count").sort_values("count", ascending=False).head(top_n)
-        fig = px.bar(
-            g, x=cat_col, y="count",
-            color=cat_col, color_discrete_sequence=PALETTE,
-            title=f"Top {top_n} {cat_col} by count"
-        )
-    else:
-        g = df.groupby(cat_col)[metric_col].mean().reset_index().sort_values(metric_col, ascending=False).head(top_n)
-        fig = px.bar(
-            g, x=cat_col, y=metric_col,
-            color=cat_col, color_discrete_sequence=PALETTE,
-            title=f"Top {top_n} {cat_col} by avg {metric_col}"
-        )
-    fig.update_layout(showlegend=False, margin=dict(l=10, r=10, t=40, b=10))
+@perf.timed()
+def categorical_bar(table, cat_col, top_n=20, metric_col=None, agg="count"):
+    fig = category_figure(engine, table, cat_col, top_n, metric_col, agg)
     st.plotly_chart(fig, use_container_width=True)
 
-def scatter_auto(df, x_col, y_col, color_col=None):
-    fig = px.scatter(
-        df, x=x_col, y=y_col, color=color_col,
-        trendline="ols",
-        color_discrete_sequence=PALETTE,
-        title=f"{y_col} vs {x_col}"
-    )
-    fig.update_traces(marker=dict(size=9, opacity=0.85))
-    fig.update_layout(margin=dict(l=10, r=10, t=40, b=10))
-    st.plotly_chart(fig, use_container_width=True)
+@perf.timed()
+def scatter_auto(df, x_col, y_col, color_col=None, fits=None):
+    st.plotly_chart(scatter_figure(df, x_col, y_col, color_col, fits), use_container_width=True)
 
+@perf.timed()
+def density_scatter(table, x_col, y_col, fits=None, color_col=None):
+    density = engine.density2d(table, x_col, y_col)
+    st.plotly_chart(density_figure(density, x_col, y_col, fits, color_col), use_container_width=True)
+
+@perf.timed()
 def box_violin(df, num_col, cat_col=None):
+    fig_box, fig_violin = box_violin_figures(df, num_col, cat_col)
     c1, c2 = st.columns(2)
     with c1:
-        fig_box = px.box(df, x=cat_col, y=num_col, color=cat_col if cat_col else None,
-                         points="suspectedoutliers", color_discrete_sequence=PALETTE,
-                         title=f"Box plot of {num_col}" + (f" by {cat_col}" if cat_col else ""))
-        fig_box.update_layout(showlegend=False, margin=dict(l=10, r=10, t=40, b=10))
         st.plotly_chart(fig_box, use_container_width=True)
     with c2:
-        fig_violin = px.violin(df, x=cat_col, y=num_col, color=cat_col if cat_col else None,
-                               box=True, points="suspectedoutliers",
-                               color_discrete_sequence=PALETTE,
-                               title=f"Violin plot of {num_col}" + (f" by {cat_col}" if cat_col else ""))
-        fig_violin.update_layout(showlegend=False, margin=dict(l=10, r=10, t=40, b=10))
         st.plotly_chart(fig_violin, use_container_width=True)
 
+@perf.timed()
+def box_violin_summary(table, num_col, cat_col=None):
+    # quartiles and fences come from SQLite; the violin's density estimate
+    # only needs a sample, restricted to the categories the box plot shows
+    stats = engine.box_stats(table, num_col, cat_col)
+    sample = engine.sample(table, [num_col, cat_col], VIOLIN_SAMPLE_ROWS)
+    if cat_col:
+        sample = sample[sample[cat_col].isin(stats["group"])]
+    c1, c2 = st.columns(2)
+    with c1:
+        st.plotly_chart(box_summary_figure(stats, num_col, cat_col), use_container_width=True)
+    with c2:
+        fig = violin_figure(sample, num_col, cat_col, points=False,
+                            title_suffix=f" ({len(sample):,}-row sample)")
+        st.plotly_chart(fig, use_container_width=True)
+
 # ----------------- Beautiful EDA Tab -----------------
-with tab3:
+EDA_VIEWS = ["Missingness", "Correlation", "Distributions", "Category analysis", "Custom explore"]
+
+# Above this many rows the point-level charts switch to summaries computed in
+# SQLite: binned density instead of points, quartile boxes, a sampled violin.
+DOWNSAMPLE_ROWS = 50_000
+VIOLIN_SAMPLE_ROWS = 20_000
+# a binned density has no per-point color; the color column instead gets one
+# OLS line per group, for this many of the largest groups
+DENSITY_COLOR_GROUPS = 10
+
+def render_eda_page():
     st.subheader("📈 EDA insights")
 
+    table_names = get_table_names()
+
     selected_table = st.selectbox("Choose a table for EDA:", table_names, key="eda_table_v2")
 
     if selected_table:
-        df = pd.read_sql_query(f"SELECT * FROM {selected_table};", conn)
-        num_cols = numeric_columns(df)
-        cat_cols = categorical_columns(df)
+        schema = engine.schema(selected_table)
+        num_cols = [c for c, kind in schema if kind == "numeric"]
+        cat_cols = [c for c, kind in schema if kind == "categorical"]
 
         # KPIs
         st.markdown("**Quick KPIs**")
         k1, k2, k3, k4 = st.columns(4)
         with k1:
-            kpi_metric("Rows", nice_number(len(df)))
+            kpi_metric("Rows", nice_number(engine.row_count(selected_table)))
         with k2:
-            kpi_metric("Columns", nice_number(df.shape[1]))
+            kpi_metric("Columns", nice_number(len(schema)))
         with k3:
             kpi_metric("Numeric cols", nice_number(len(num_cols)))
         with k4:
@@ -353,34 +323,35 @@ with tab3:
         st.divider()
 
         # Missingness & correlation
-        c_top = st.tabs(["Missingness", "Correlation", "Distributions", "Category analysis", "Custom explore"])
-        with c_top[0]:
-            show_missingness(df)
-        with c_top[1]:
-            show_correlation(df)
+        eda_view = st.radio("View", EDA_VIEWS, horizontal=True, key="eda_view",
+                            label_visibility="collapsed")
+        if eda_view == "Missingness":
+            show_missingness(selected_table)
+        elif eda_view == "Correlation":
+            show_correlation(selected_table)
 
         # Distributions
-        with c_top[2]:
+        elif eda_view == "Distributions":
             bins = st.slider("Bins for histograms", 10, 80, 30, 2)
-            dist_grid(df, num_cols, bins=bins)
+            dist_grid(selected_table, num_cols, bins=bins)
 
         # Category analysis
-        with c_top[3]:
+        elif eda_view == "Category analysis":
             if cat_cols:
                 cat_col = st.selectbox("Categorical column", cat_cols, key="eda_cat_col")
                 mode = st.radio("Aggregation mode", ["count", "average of a numeric column"], horizontal=True)
                 if mode == "count":
                     top_n = st.slider("Top N", 5, 50, 20, 5)
-                    categorical_bar(df, cat_col, top_n=top_n, metric_col=None, agg="count")
+                    categorical_bar(selected_table, cat_col, top_n=top_n, metric_col=None, agg="count")
                 else:
                     metric_col = st.selectbox("Numeric column to average", num_cols, key="eda_metric_col")
                     top_n = st.slider("Top N", 5, 50, 20, 5)
-                    categorical_bar(df, cat_col, top_n=top_n, metric_col=metric_col, agg="avg")
+                    categorical_bar(selected_table, cat_col, top_n=top_n, metric_col=metric_col, agg="avg")
             else:
                 st.info("No categorical columns found.")
 
         # Custom explore
-        with c_top[4]:
+        elif eda_view == "Custom explore":
             if len(num_cols) >= 2:
                 c1, c2 = st.columns(2)
                 with c1:
@@ -388,41 +359,186 @@ with tab3:
                 with c2:
                     y_col = st.selectbox("Y axis (numeric)", [c for c in num_cols if c != st.session_state.get("eda_x")], key="eda_y")
                 color_col = st.selectbox("Color (optional categorical)", [None] + cat_cols, key="eda_color")
-                scatter_auto(df, x_col, y_col, color_col if color_col != None else None)
+                n_rows = engine.row_count(selected_table)
+                downsample = n_rows > DOWNSAMPLE_ROWS
+                if downsample:
+                    st.caption(f"{nice_number(n_rows)} rows: charts are drawn from summaries computed in "
+                               f"SQLite (above {DOWNSAMPLE_ROWS:,} rows).")
+                    if color_col:
+                        fits = engine.ols(selected_table, x_col, y_col, color_col).nlargest(DENSITY_COLOR_GROUPS, "n")
+                        st.caption(f"Color: one OLS line per `{color_col}` for the {len(fits)} largest groups; "
+                                   f"the density covers all rows.")
+                    else:
+                        fits = engine.ols(selected_table, x_col, y_col)
+                    density_scatter(selected_table, x_col, y_col, fits, color_col)
+                else:
+                    # point-level charts still need rows, but only the columns they plot
+                    df = read_columns(selected_table, [x_col, y_col, color_col])
+                    fits = engine.ols(selected_table, x_col, y_col, color_col)
+                    scatter_auto(df, x_col, y_col, color_col if color_col != None else None, fits)
                 # Box/violin for outliers & distribution shape
                 num_for_box = st.selectbox("Numeric column for box/violin", num_cols, key="eda_box_num")
                 cat_for_box = st.selectbox("Category (optional)", [None] + cat_cols, key="eda_box_cat")
-                box_violin(df, num_for_box, cat_for_box if cat_for_box != None else None)
+                if downsample:
+                    box_violin_summary(selected_table, num_for_box, cat_for_box)
+                else:
+                    df = read_columns(selected_table, [num_for_box, cat_for_box])
+                    box_violin(df, num_for_box, cat_for_box if cat_for_box != None else None)
             else:
                 st.info("Not enough numeric columns for custom scatter/box.")
 
 
 # ----------------- Compare Tables Tab -----------------
-with tab4:
+COMPARE_PREVIEW_ROWS = 100
+
+def render_compare_page():
     st.subheader("🔗 Compare Tables")
 
+    table_names = get_table_names()
+
     # Select two tables to join
     table1 = st.selectbox("Choose first table:", table_names, key="compare1")
     table2 = st.selectbox("Choose second table:", table_names, key="compare2")
 
-    # Assume common key is product_id
+    # Join key: any column name, checked against both tables' PRAGMA
+    # table_info before the join runs (product_code is common to all three)
     join_key = st.text_input("Enter join key (default: product_code)", "product_code")
+    how = st.radio("Join type", ["inner", "left", "anti"], horizontal=True, key="compare_how",
+                   help="anti: rows of the first table with no match in the second")
 
+    # The join runs inside SQLite with the row limit pushed down; only the
+    # preview rows and aggregate counts come back to pandas.
     if st.button("🔍 Compare"):
         try:
-            df1 = pd.read_sql_query(f"SELECT * FROM {table1};", conn)
-            df2 = pd.read_sql_query(f"SELECT * FROM {table2};", conn)
-
-            if join_key in df1.columns and join_key in df2.columns:
-                merged = pd.merge(df1, df2, on=join_key, how="inner")
-
-                st.success(f"✅ Joined {table1} and {table2} on `{join_key}`")
-                st.dataframe(merged.head(100), use_container_width=True)
-            else:
-                st.error(f"❌ Join key `{join_key}` not found in both tables.")
+            missing = [t for t in (table1, table2) if not engine.has_column(t, join_key)]
+            if missing:
+                st.error(f"❌ Join key `{join_key}` not found in: {', '.join(missing)}.")
+                return
+
+            counts = engine.join_counts(table1, table2, join_key)
+            merged = engine.join(table1, table2, join_key, how=how, limit=COMPARE_PREVIEW_ROWS)
+
+            st.success(f"✅ Joined {table1} and {table2} on `{join_key}` ({how})")
+            k1, k2, k3, k4 = st.columns(4)
+            with k1:
+                kpi_metric(f"{table1} rows", nice_number(counts["left_rows"]))
+            with k2:
+                kpi_metric(f"{table2} rows", nice_number(counts["right_rows"]))
+            with k3:
+                kpi_metric("Matched rows", nice_number(counts["matched_rows"]))
+            with k4:
+                kpi_metric(f"Only in {table1}", nice_number(counts["left_only_rows"]))
+            st.dataframe(merged, use_container_width=True)
 
         except Exception as e:
             st.error(f"❌ Error comparing tables:\n\n{e}")
+
+# ----------------- SQL Console Tab -----------------
+CONSOLE_DEFAULT_SQL = "SELECT brand, COUNT(*) AS product_count FROM product_info GROUP BY brand ORDER BY product_count DESC LIMIT 20;"
+
+def cancel_console_query():
+    cancel = st.session_state.get("console_cancel")
+    if cancel is not None:
+        cancel.set()
+    st.session_state["console_result"] = ("error", "⏹️ Query cancelled.")
+
+def render_console_page():
+    st.subheader("🧪 SQL Console")
+    st.caption(f"Read-only SELECT queries. Each query gets {TIME_BUDGET_S:g}s and returns at most "
+               f"{MAX_ROWS:,} rows / {MAX_BYTES // 2**20} MiB; at most {MAX_HEAVY_QUERIES} full-table-scan "
+               f"queries run at once across all users.")
+    sql = st.text_area("SQL", CONSOLE_DEFAULT_SQL, height=140, key="console_sql")
+
+    if st.button("▶️ Run", key="console_run"):
+        # The query runs on a worker thread while this script polls it. A
+        # Cancel click (or leaving the page) interrupts the polling loop at its
+        # next Streamlit call, and the finally block then stops the query.
+        cancel = threading.Event()
+        st.session_state["console_cancel"] = cancel
+        future = submit(sql, cancel)
+        st.button("⏹️ Cancel", key="console_cancel_btn", on_click=cancel_console_query)
+        status = st.empty()
+        start = time.monotonic()
+        try:
+            while not future.done():
+                status.caption(f"⏳ Running… {time.monotonic() - start:.1f}s")
+                time.sleep(0.1)
+        finally:
+            if not future.done():
+                cancel.set()
+        status.empty()
+        try:
+            result = future.result()
+            # timed by the worker: the poll loop above only sees a finished future
+            elapsed_ms = result["elapsed_s"] * 1000
+            perf.record("console", " ".join(sql.split())[:200], elapsed_ms,
+                        rows=len(result["rows"]), bytes=result["bytes"])
+            if elapsed_ms >= perf.slow_query_ms:
+                perf.log_slow_query(sql, (), elapsed_ms, len(result["rows"]))
+            st.session_state["console_result"] = ("ok", result)
+        except QueryCancelled:
+            st.session_state["console_result"] = ("error", "⏹️ Query cancelled.")
+        except TimeoutError as e:
+            st.session_state["console_result"] = ("error", f"⏱️ {e}. Add a WHERE clause or LIMIT, or use an indexed column.")
+        except Exception as e:
+            st.session_state["console_result"] = ("error", f"❌ {e}")
+
+    # keep the last result across reruns (e.g. when preparing a download)
+    outcome = st.session_state.get("console_result")
+    if outcome is None:
+        return
+    kind, payload = outcome
+    if kind == "error":
+        st.error(payload)
+        return
+    df = pd.DataFrame(payload["rows"], columns=payload["columns"])
+    st.success(f"✅ {len(df):,} rows in {payload['elapsed_s']:.2f}s"
+               + (" (full table scan)" if payload["heavy"] else ""))
+    if payload["truncated"]:
+        st.warning(f"Result truncated at the {payload['truncated']} limit; add a LIMIT or narrower WHERE clause.")
+    st.dataframe(df, use_container_width=True)
+
+# ----------------- Render Active Page -----------------
+PAGES = {
+    "🔎 Queries": render_queries_page,
+    "🧪 SQL Console": render_console_page,
+    "📋 Tables": render_tables_page,
+    "📈 EDA Insights": render_eda_page,
+    "🔗 Compare Tables": render_compare_page,
+}
+PAGES[active_page]()
+
+# ----------------- Performance Panel -----------------
+# Shows recent events from all sessions; everything is also written to
+# choco_perf.jsonl, and slow queries with their plans to choco_slow_queries.jsonl.
+if show_perf:
+    with st.sidebar:
+        stats = query_cache.stats()
+        st.caption(f"Query cache: {stats['entries']} entries, {stats['bytes'] / 2**20:.1f} MiB, "
+                   f"{stats['hits']} hits / {stats['misses']} misses")
+        # the recorder is shared by every session; Clear only moves this
+        # session's starting point
+        since = st.session_state.get("perf_since")
+        summary = perf.summary(since)
+        if summary:
+            st.dataframe(pd.DataFrame(summary).T, use_container_width=True)
+        events, slow = perf.snapshot(since)
+        st.markdown("**Recent events**")
+        st.dataframe(pd.DataFrame(events[::-1][:50], columns=["kind", "name", "elapsed_ms", "rows", "bytes", "cache"]),
+                     use_container_width=True)
+        st.markdown(f"**Slow queries (≥ {perf.slow_query_ms} ms)**",
+                    help="Logged with their EXPLAIN QUERY PLAN. The threshold is shared by all "
+                         "sessions; set CHOCO_SLOW_QUERY_MS before starting the app to change it.")
+        if not slow:
+            st.caption("None recorded.")
+        for entry in slow[::-1][:10]:
+            with st.expander(f"{entry['elapsed_ms']:.0f} ms · {entry['rows']} rows"):
+                st.code(entry["sql"], language="sql")
+                st.code("\n".join(entry["plan"] or []), language="text")
+        if st.button("Clear", key="perf_clear", help="Hides the events so far in this session only"):
+            st.session_state["perf_since"] = time.time()
+            st.rerun()
+
 # ----------------- Summary & Insights Tab -----------------
 with st.expander("📊 Summary Insights & Recommendations"):
     st.markdown("""
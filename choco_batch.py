@@ -0,0 +1,144 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from choco_db import DB_PATH, ConnectionPool, db_version
+from choco_export import EXPORT_FORMATS, export
+from choco_queries import queries
+from choco_rollups import rollups_fresh
+
+BATCH_FORMATS = {"parquet": "Parquet", "jsonl": "JSON Lines", "csv": "CSV"}
+
+
+# ----------------- Job Planning -----------------
+def plan_jobs(catalog=queries, categories=None, keys=None):
+    # (category, key, query) in catalog order, optionally filtered
+    unknown = set(categories or []) - set(catalog)
+    if unknown:
+        raise ValueError(f"unknown categories: {', '.join(sorted(unknown))}")
+    jobs = [(category, key, query)
+            for category, entries in catalog.items() if not categories or category in categories
+            for key, query in entries.items() if not keys or key in keys]
+    if keys and len({key for _, key, _ in jobs}) < len(set(keys)):
+        missing = set(keys) - {key for _, key, _ in jobs}
+        raise ValueError(f"unknown query keys: {', '.join(sorted(missing))}")
+    return jobs
+
+
+def run_job(pool, job, out_dir, fmt, use_rollups=True):
+    # writes one result file (via a temp name, so a partial file is never
+    # left under the final name) and returns its manifest entry
+    category, key, query = job
+    source = "rollup" if use_rollups and "rollup" in query else "sql"
+    sql = query[source]
+    path = os.path.join(out_dir, category, f"{key}.{EXPORT_FORMATS[fmt]['ext']}")
+    entry = {"category": category, "key": key, "question": query["question"], "source": source,
+             "sql": sql, "file": os.path.relpath(path, out_dir)}
+    tmp = f"{path}.tmp"
+    start = time.perf_counter()
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with pool.connection() as conn, open(tmp, "wb") as dest:
+            rows = export(conn, sql, dest, fmt)
+        os.replace(tmp, path)
+        entry.update(status="ok", rows=rows, bytes=os.path.getsize(path))
+    except Exception as e:
+        entry.update(status="error", error=f"{type(e).__name__}: {e}", rows=None, bytes=None)
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    entry["elapsed_s"] = round(time.perf_counter() - start, 4)
+    return entry
+
+
+# ----------------- Batch Run -----------------
+def run_batch(db_path=DB_PATH, out_dir=None, fmt="Parquet", categories=None, keys=None,
+              workers=4, use_rollups=True, log=print):
+    jobs = plan_jobs(queries, categories, keys)
+    out_dir = out_dir or os.path.join("batch_output", time.strftime("%Y%m%dT%H%M%S"))
+    os.makedirs(out_dir, exist_ok=True)
+    pool = ConnectionPool(db_path, size=workers)
+    started, start = time.time(), time.perf_counter()
+    version = db_version(db_path)
+    with pool.connection() as conn:
+        fresh = rollups_fresh(conn)
+    if use_rollups and not fresh:
+        log("rollup tables are missing or stale; running the base SQL for every query")
+    use_rollups = use_rollups and fresh
+    entries = []
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(run_job, pool, job, out_dir, fmt, use_rollups) for job in jobs]
+            for future in as_completed(futures):
+                entry = future.result()
+                entries.append(entry)
+                name = f"{entry['category']}.{entry['key']}"
+                log(f"{entry['status']:>5}  {name:<56} "
+                    f"{entry['rows'] if entry['rows'] is not None else '-':>8} rows  {entry['elapsed_s']:7.3f}s"
+                    + (f"  {entry['error']}" if entry["status"] != "ok" else ""))
+    finally:
+        pool.close()
+
+    # keep the manifest in catalog order regardless of completion order
+    order = {(c, k): i for i, (c, k, _) in enumerate(jobs)}
+    entries.sort(key=lambda e: order[(e["category"], e["key"])])
+    manifest = {
+        "db_path": os.path.abspath(db_path),
+        "db_version": list(version),
+        # a writer touched the file mid-run; results may mix two versions
+        "db_changed_during_run": db_version(db_path) != version,
+        "format": fmt,
+        "workers": workers,
+        "use_rollups": use_rollups,
+        "rollups_fresh": fresh,
+        "started_at": int(started),
+        "elapsed_s": round(time.perf_counter() - start, 4),
+        "succeeded": sum(e["status"] == "ok" for e in entries),
+        "failed": sum(e["status"] != "ok" for e in entries),
+        "queries": entries,
+    }
+    tmp = os.path.join(out_dir, "manifest.json.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, os.path.join(out_dir, "manifest.json"))
+    return out_dir, manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the predefined query catalog headlessly, in parallel.")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--out-dir", help="default: batch_output/<timestamp>")
+    parser.add_argument("--format", choices=list(BATCH_FORMATS), default="parquet")
+    parser.add_argument("--category", action="append", choices=list(queries),
+                        help="only this category (repeatable)")
+    parser.add_argument("--query", action="append", help="only this query key (repeatable)")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--base-sql", action="store_true",
+                        help="run each query's base SQL even where a rollup answers it")
+    args = parser.parse_args(argv)
+
+    fmt = BATCH_FORMATS[args.format]
+    if fmt == "Parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            parser.error("--format parquet needs pyarrow (pip install pyarrow); or use --format jsonl")
+    if not os.path.exists(args.db):
+        parser.error(f"{args.db} not found")
+
+    try:
+        out_dir, manifest = run_batch(args.db, args.out_dir, fmt, args.category, args.query,
+                                      args.workers, not args.base_sql)
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"{manifest['succeeded']} succeeded, {manifest['failed']} failed in {manifest['elapsed_s']:.2f}s; "
+          f"manifest: {os.path.join(out_dir, 'manifest.json')}")
+    if manifest["db_changed_during_run"]:
+        print("warning: the database changed during the run")
+    return 1 if manifest["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,286 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import re
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from choco_charts import (box_summary_figure, category_figure, correlation_figure, density_figure,
+                          distribution_figure, scatter_figure)
+from choco_db import connect_readonly, stream_query
+from choco_dtypes import apply_dtypes
+from choco_export import export
+from choco_load import bulk_load, load_table
+from choco_metrics import recompute_in_db
+from choco_pushdown import PushdownEngine
+from choco_queries import queries
+from choco_transform import NUTRIENT_COLUMNS
+
+DEFAULT_SIZES = ["10k", "1M", "10M"]
+# committed results for the 10k and 1M sizes, so a fresh checkout has
+# something to compare against (sizes missing from it are not compared);
+# regenerate with --out bench/baseline.json
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench", "baseline.json")
+GEN_CHUNK = 200_000
+
+# ----------------- Synthetic Data Shape -----------------
+# Brand popularity follows a Zipf law over a fixed set of brands (a few
+# global brands, a long tail of small ones); null rates are roughly what the
+# OpenFoodFacts download shows.
+N_BRANDS = 5000
+BRAND_ZIPF = 1.1
+NULL_RATES = {
+    "product_name": 0.02, "brand": 0.08,
+    "energy_kcal_value": 0.04, "energy_kj_value": 0.06, "carbohydrates_value": 0.05,
+    "sugars_value": 0.05, "fat_value": 0.05, "saturated_fat_value": 0.08,
+    "proteins_value": 0.05, "fiber_value": 0.35, "salt_value": 0.10, "sodium_value": 0.10,
+    "fruits_vegetables_nuts_estimate_100g": 0.55, "nutrition_score_fr": 0.25, "nova_group": 0.30,
+}
+
+
+def parse_size(text):
+    m = re.fullmatch(r"(\d+(?:\.\d+)?)([kKmM]?)", text)
+    if not m:
+        raise argparse.ArgumentTypeError(f"bad size: {text}")
+    scale = {"": 1, "k": 1_000, "m": 1_000_000}[m.group(2).lower()]
+    return int(float(m.group(1)) * scale)
+
+
+def _with_nulls(rng, name, values):
+    mask = rng.random(len(values)) < NULL_RATES.get(name, 0.0)
+    return [None if m else v for v, m in zip(values.tolist(), mask.tolist())]
+
+
+def brand_weights(n_brands=N_BRANDS, s=BRAND_ZIPF):
+    weights = 1.0 / np.arange(1, n_brands + 1) ** s
+    return weights / weights.sum()
+
+
+def synthetic_chunk(rng, start, n, weights):
+    ids = np.arange(start, start + n)
+    brand_ids = rng.choice(len(weights), n, p=weights) + 1
+    kcal = np.clip(rng.normal(520, 80, n), 0, 900)
+    carbs = rng.uniform(20, 65, n)
+    fat = np.clip(rng.normal(30, 8, n), 0, 100)
+    salt = rng.gamma(1.0, 0.15, n)
+    columns = {
+        "energy_kcal_value": kcal,
+        "energy_kj_value": kcal * 4.184,
+        "carbohydrates_value": carbs,
+        "sugars_value": carbs * rng.beta(5, 2, n),
+        "fat_value": fat,
+        "saturated_fat_value": fat * rng.uniform(0.4, 0.7, n),
+        "proteins_value": np.clip(rng.normal(7, 2, n), 0, None),
+        "fiber_value": rng.gamma(2.0, 2.0, n),
+        "salt_value": salt,
+        "sodium_value": salt / 2.5,
+        "fruits_vegetables_nuts_estimate_100g": np.where(rng.random(n) < 0.7, 0.0, rng.uniform(0, 60, n)),
+        "nutrition_score_fr": rng.integers(-5, 31, n),
+        "nova_group": rng.choice([1, 2, 3, 4], n, p=[0.02, 0.03, 0.15, 0.80]),
+    }
+    codes = [f"{i:013d}" for i in ids.tolist()]
+    products = zip(codes,
+                   _with_nulls(rng, "product_name", np.char.add("Choco ", (ids // 3).astype(str))),
+                   _with_nulls(rng, "brand", np.char.add("Brand ", brand_ids.astype(str))))
+    nutrients = zip(codes, *(_with_nulls(rng, col, columns[col]) for col in NUTRIENT_COLUMNS[1:]))
+    return products, nutrients
+
+
+def generate(db_path, n_rows, seed=0):
+    # streamed in chunks, so 10M rows never sit in memory at once
+    rng = np.random.default_rng(seed)
+    weights = brand_weights()
+
+    def load(conn, batch_size):
+        for start in range(0, n_rows, GEN_CHUNK):
+            products, nutrients = synthetic_chunk(rng, start, min(GEN_CHUNK, n_rows - start), weights)
+            load_table(conn, "product_info", products, batch_size)
+            load_table(conn, "nutrient_info", nutrients, batch_size)
+        with conn:
+            recompute_in_db(conn)
+
+    bulk_load(load, db_path, snapshot_dir=None)
+
+
+# ----------------- Workload -----------------
+def workload(db_path):
+    # (name, callable) for everything the dashboard does, run without the
+    # app's query cache so every repeat does the real work
+    conn = connect_readonly(db_path)
+
+    def run(sql, params=(), dtypes=None):
+        df = pd.read_sql_query(sql, conn, params=params)
+        return apply_dtypes(df, dtypes) if dtypes else df
+
+    def stream(sql, params=(), chunk_rows=50_000):
+        return stream_query(conn, sql, params, chunk_rows)
+
+    engine = PushdownEngine(run, stream=stream)
+    cases = []
+    for category, entries in queries.items():
+        for key, query in entries.items():
+            cases.append((f"query/{category}.{key}", lambda sql=query["sql"]: run(sql)))
+            if "rollup" in query:
+                cases.append((f"query/{category}.{key}[rollup]", lambda sql=query["rollup"]: run(sql)))
+
+    num_cols = engine.numeric_columns("nutrient_info")
+    cases += [
+        ("eda/show_correlation", lambda: correlation_figure(engine, "nutrient_info")),
+        ("eda/dist_grid", lambda: [distribution_figure(engine, "nutrient_info", c) for c in num_cols[:6]]),
+        ("eda/categorical_bar", lambda: category_figure(engine, "product_info", "brand")),
+        ("eda/scatter_auto", lambda: scatter_figure(
+            engine.read_columns("nutrient_info", ["energy_kcal_value", "sugars_value"]),
+            "energy_kcal_value", "sugars_value",
+            fits=engine.ols("nutrient_info", "energy_kcal_value", "sugars_value"))),
+        ("eda/density_scatter", lambda: density_figure(
+            engine.density2d("nutrient_info", "energy_kcal_value", "sugars_value"),
+            "energy_kcal_value", "sugars_value",
+            fits=engine.ols("nutrient_info", "energy_kcal_value", "sugars_value"))),
+        ("eda/box_summary", lambda: box_summary_figure(
+            engine.box_stats("derived_metrics", "sugar_to_carb_ratio", "calorie_category"),
+            "sugar_to_carb_ratio", "calorie_category")),
+        ("compare/join_counts", lambda: engine.join_counts("product_info", "nutrient_info", "product_code")),
+        ("compare/join_preview", lambda: engine.join("product_info", "nutrient_info", "product_code")),
+        ("export/csv", lambda: _export_csv(conn, "SELECT * FROM nutrient_info;")),
+    ]
+    return conn, cases
+
+
+def _export_csv(conn, sql):
+    with tempfile.TemporaryFile() as dest:
+        export(conn, sql, dest, "CSV")
+        return dest.tell()
+
+
+def _size_of(result):
+    if isinstance(result, pd.DataFrame):
+        return len(result)
+    if isinstance(result, (list, dict)):
+        return len(result)
+    return None
+
+
+def measure(fn, repeat=3):
+    # wall time is the median of untraced runs; peak memory comes from one
+    # extra run under tracemalloc (Python allocations only: SQLite's page
+    # cache is not included, and tracing slows that run down)
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    rows = _size_of(result)
+    del result
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"wall_s": statistics.median(times), "wall_runs": times, "peak_bytes": peak, "rows": rows}
+
+
+def run_suite(sizes, workdir, repeat=3, only=None, seed=0, regenerate=False, log=print):
+    os.makedirs(workdir, exist_ok=True)
+    results = {
+        "created_at": int(time.time()),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "pandas": pd.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "sizes": {},
+    }
+    for n in sizes:
+        db_path = os.path.join(workdir, f"bench_{n}_s{seed}.db")
+        if regenerate or not os.path.exists(db_path):
+            log(f"generating {n:,} products -> {db_path}")
+            start = time.perf_counter()
+            generate(db_path, n, seed)
+            log(f"  generated in {time.perf_counter() - start:.1f}s")
+        conn, cases = workload(db_path)
+        size_results = {"db_bytes": os.path.getsize(db_path), "cases": {}}
+        try:
+            for name, fn in cases:
+                if only and not re.search(only, name):
+                    continue
+                r = measure(fn, repeat)
+                size_results["cases"][name] = r
+                log(f"  {n:>10,}  {name:<70} {r['wall_s'] * 1000:10.1f} ms  {r['peak_bytes'] / 2**20:8.1f} MiB")
+        finally:
+            conn.close()
+        results["sizes"][str(n)] = size_results
+    return results
+
+
+# ----------------- Baseline Comparison -----------------
+def compare_to_baseline(results, baseline, tolerance=0.25, min_seconds=0.005, min_bytes=1 << 20):
+    # a case regresses when it is both relatively and absolutely worse, so
+    # millisecond-level noise on tiny queries does not trip the check
+    regressions = []
+    for size, current in results["sizes"].items():
+        old_cases = baseline.get("sizes", {}).get(size, {}).get("cases", {})
+        for name, new in current["cases"].items():
+            old = old_cases.get(name)
+            if old is None:
+                continue
+            if (new["wall_s"] > old["wall_s"] * (1 + tolerance)
+                    and new["wall_s"] - old["wall_s"] > min_seconds):
+                regressions.append((size, name, "wall_s", old["wall_s"], new["wall_s"]))
+            if (new["peak_bytes"] > old["peak_bytes"] * (1 + tolerance)
+                    and new["peak_bytes"] - old["peak_bytes"] > min_bytes):
+                regressions.append((size, name, "peak_bytes", old["peak_bytes"], new["peak_bytes"]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard workload on synthetic databases.")
+    parser.add_argument("--sizes", nargs="+", type=parse_size, default=[parse_size(s) for s in DEFAULT_SIZES],
+                        help="product counts, e.g. 10k 1M 10M")
+    parser.add_argument("--workdir", default="bench_data", help="where generated databases are kept and reused")
+    parser.add_argument("--regenerate", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", help="regex selecting case names, e.g. '^query/' or 'eda/'")
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--baseline", default=BASELINE_PATH,
+                        help="earlier results file to compare against (default: the committed "
+                             "bench/baseline.json; '' to skip)")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown")
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.sizes, args.workdir, args.repeat, args.only, args.seed, args.regenerate)
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"wrote {args.out}")
+
+    if not args.baseline:
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"no baseline at {args.baseline}; nothing to compare against")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if (baseline.get("machine"), baseline.get("cpus")) != (results["machine"], results["cpus"]):
+        print(f"note: baseline was recorded on {baseline.get('machine')} with {baseline.get('cpus')} cpus, "
+              f"this run is {results['machine']} with {results['cpus']}; timings may not be comparable")
+    regressions = compare_to_baseline(results, baseline, args.tolerance)
+    for size, name, metric, old, new in regressions:
+        print(f"REGRESSION {int(size):,} {name} {metric}: {old:,.4g} -> {new:,.4g} ({new / old:.2f}x)")
+    print(f"{len(regressions)} regression(s) against {args.baseline}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+import numpy as np
+import plotly.express as px
+import plotly.graph_objects as go
+
+# ----------------- Styling -----------------
+PALETTE = px.colors.qualitative.Vivid  # Alt options: Bold, D3, Set3
+BG_COLOR = "#0f1116"  # for dark vibes; switch to white for light
+PRIMARY = "#7c3aed"   # purple accent
+ACCENT = "#22d3ee"    # cyan accent
+
+
+# ----------------- Figure Builders -----------------
+# Streamlit-free so the app and the benchmark suite build the same figures.
+# The table-based builders run their aggregates through a PushdownEngine and
+# return None when there is nothing to plot.
+def missingness_figure(engine, table):
+    miss_df = engine.missingness(table)
+    if miss_df.empty:
+        return None
+    fig = px.bar(
+        miss_df,
+        x="column", y="missing_pct",
+        color="missing_pct",
+        color_continuous_scale="Turbo",
+        labels={"missing_pct": "Missing (%)"},
+        height=350
+    )
+    fig.update_layout(margin=dict(l=10, r=10, t=10, b=10), showlegend=False)
+    return fig
+
+
+def correlation_figure(engine, table, title="Correlation heatmap"):
+    num_cols = engine.numeric_columns(table)
+    if len(num_cols) < 2:
+        return None
+    corr = engine.correlation(table, num_cols)
+    fig = px.imshow(
+        corr,
+        text_auto=True,
+        color_continuous_scale="RdBu",
+        aspect="auto",
+        title=title
+    )
+    fig.update_layout(margin=dict(l=10, r=10, t=40, b=10))
+    return fig
+
+
+def distribution_figure(engine, table, col, bins=30):
+    hist = engine.histogram(table, col, bins=bins)
+    hist["bin_mid"] = (hist["bin_start"] + hist["bin_end"]) / 2
+    fig = px.bar(
+        hist, x="bin_mid", y="count",
+        hover_data=["bin_start", "bin_end"],
+        labels={"bin_mid": col},
+        color_discrete_sequence=[PRIMARY],
+        title=f"Distribution of {col}"
+    )
+    fig.update_layout(bargap=0, margin=dict(l=10, r=10, t=40, b=10))
+    return fig
+
+
+def category_figure(engine, table, cat_col, top_n=20, metric_col=None, agg="count"):
+    if agg == "count" or metric_col is None:
+        g = engine.category_counts(table, cat_col, top_n)
+        fig = px.bar(
+            g, x=cat_col, y="count",
+            color=cat_col, color_discrete_sequence=PALETTE,
+            title=f"Top {top_n} {cat_col} by count"
+        )
+    else:
+        g = engine.category_means(table, cat_col, metric_col, top_n)
+        fig = px.bar(
+            g, x=cat_col, y=metric_col,
+            color=cat_col, color_discrete_sequence=PALETTE,
+            title=f"Top {top_n} {cat_col} by avg {metric_col}"
+        )
+    fig.update_layout(showlegend=False, margin=dict(l=10, r=10, t=40, b=10))
+    return fig
+
+
+def add_fit_lines(fig, fits, group_label=None):
+    # OLS lines from PushdownEngine.ols, one per group
+    for i, fit in enumerate(fits.itertuples(index=False)):
+        xs = [fit.x_min, fit.x_max]
+        name = "OLS" if fit.group is None else f"OLS {group_label} = {fit.group}"
+        fig.add_scatter(x=xs, y=[fit.intercept + fit.slope * x for x in xs], mode="lines",
+                        name=name, line=dict(color=ACCENT if fit.group is None else PALETTE[i % len(PALETTE)]),
+                        hovertemplate=f"slope {fit.slope:.4g}<br>intercept {fit.intercept:.4g}<br>n {fit.n:,}")
+    return fig
+
+
+def scatter_figure(df, x_col, y_col, color_col=None, fits=None):
+    # WebGL points; the trend line is fitted in SQL rather than by plotly
+    fig = px.scatter(
+        df, x=x_col, y=y_col, color=color_col,
+        render_mode="webgl",
+        color_discrete_sequence=PALETTE,
+        title=f"{y_col} vs {x_col}"
+    )
+    fig.update_traces(marker=dict(size=9, opacity=0.85))
+    if fits is not None:
+        add_fit_lines(fig, fits, color_col)
+    fig.update_layout(margin=dict(l=10, r=10, t=40, b=10))
+    return fig
+
+
+def density_figure(density, x_col, y_col, fits=None, group_label=None):
+    # 2D binned counts from PushdownEngine.density2d instead of raw points;
+    # grouped fits (per color value) are drawn as separate lines
+    fig = go.Figure(go.Heatmap(
+        x=_bin_mids(density, "x"), y=_bin_mids(density, "y"), z=_count_grid(density),
+        colorscale="Viridis", colorbar=dict(title="rows"),
+        hovertemplate=f"{x_col} %{{x:.4g}}<br>{y_col} %{{y:.4g}}<br>rows %{{z:,}}<extra></extra>",
+    ))
+    if fits is not None:
+        add_fit_lines(fig, fits, group_label)
+    fig.update_layout(title=f"{y_col} vs {x_col} (binned density)", xaxis_title=x_col, yaxis_title=y_col,
+                      margin=dict(l=10, r=10, t=40, b=10))
+    return fig
+
+
+def _bin_mids(density, axis):
+    # bins are equally spaced, so empty ones can be placed from any filled one
+    if density.empty:
+        return []
+    first = density.iloc[0]
+    width = first[f"{axis}_end"] - first[f"{axis}_start"]
+    lo = first[f"{axis}_start"] - width * first[f"{axis}_bin"]
+    return lo + width * (np.arange(int(density[f"{axis}_bin"].max()) + 1) + 0.5)
+
+
+def _count_grid(density):
+    if density.empty:
+        return [[]]
+    z = np.full((int(density["y_bin"].max()) + 1, int(density["x_bin"].max()) + 1), np.nan)
+    z[density["y_bin"].to_numpy(), density["x_bin"].to_numpy()] = density["count"].to_numpy()
+    return z  # empty bins stay NaN so they render transparent
+
+
+def violin_figure(df, num_col, cat_col=None, points="suspectedoutliers", title_suffix=""):
+    suffix = f" by {cat_col}" if cat_col else ""
+    fig = px.violin(df, x=cat_col, y=num_col, color=cat_col if cat_col else None,
+                    box=True, points=points,
+                    color_discrete_sequence=PALETTE,
+                    title=f"Violin plot of {num_col}" + suffix + title_suffix)
+    fig.update_layout(showlegend=False, margin=dict(l=10, r=10, t=40, b=10))
+    return fig
+
+
+def box_violin_figures(df, num_col, cat_col=None):
+    suffix = f" by {cat_col}" if cat_col else ""
+    fig_box = px.box(df, x=cat_col, y=num_col, color=cat_col if cat_col else None,
+                     points="suspectedoutliers", color_discrete_sequence=PALETTE,
+                     title=f"Box plot of {num_col}" + suffix)
+    fig_box.update_layout(showlegend=False, margin=dict(l=10, r=10, t=40, b=10))
+    return fig_box, violin_figure(df, num_col, cat_col)
+
+
+def box_summary_figure(stats, num_col, cat_col=None):
+    # box plot drawn from PushdownEngine.box_stats quartiles and fences;
+    # outliers are counted rather than drawn
+    suffix = f" by {cat_col}" if cat_col else ""
+    fig = go.Figure()
+    for i, row in enumerate(stats.itertuples(index=False)):
+        label = str(row.group) if cat_col else num_col
+        fig.add_trace(go.Box(
+            x=[label], q1=[row.q1], median=[row.median], q3=[row.q3],
+            lowerfence=[row.lowerfence], upperfence=[row.upperfence], mean=[row.mean],
+            name=label, marker_color=PALETTE[i % len(PALETTE)],
+            hovertext=f"{row.count:,} rows, {row.outliers:,} outliers",
+        ))
+    fig.update_layout(title=f"Box plot of {num_col}" + suffix, yaxis_title=num_col, showlegend=False,
+                      margin=dict(l=10, r=10, t=40, b=10))
+    return fig
@@ -0,0 +1,201 @@
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from choco_db import DB_PATH, connect_readonly
+from choco_migrations import explain, full_scans
+
+TIME_BUDGET_S = 10.0
+MAX_ROWS = 10_000
+MAX_BYTES = 32 * 1024 * 1024
+FETCH_BATCH = 1000
+# the progress handler runs every this many SQLite VM instructions
+PROGRESS_STEPS = 20_000
+
+# Queries that would scan a whole table share a small number of slots across
+# all sessions in the process; index-driven queries are not limited. A scan
+# first gets a short trial without a slot, so one a LIMIT stops early (e.g.
+# SELECT * FROM product_info LIMIT 5) never waits for one.
+MAX_HEAVY_QUERIES = 2
+HEAVY_WAIT_S = 5.0
+TRIAL_STEPS = 500_000
+_heavy_slots = threading.BoundedSemaphore(MAX_HEAVY_QUERIES)
+
+# A query's budget only starts once a worker picks it up, so nothing is left
+# queued behind busy workers: a submission takes a worker permit up front or
+# is turned away.
+CONSOLE_WORKERS = 8
+_executor = ThreadPoolExecutor(max_workers=CONSOLE_WORKERS, thread_name_prefix="sql-console")
+_worker_permits = threading.BoundedSemaphore(CONSOLE_WORKERS)
+
+
+class QueryCancelled(RuntimeError):
+    pass
+
+
+# ----------------- Authorizer -----------------
+# The connection is already read-only; this also keeps the console away from
+# ATTACH (other files), PRAGMA and anything that isn't a plain read.
+# randomblob/zeroblob would build huge values from a single number.
+_ALLOWED_ACTIONS = {sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ, sqlite3.SQLITE_FUNCTION,
+                    getattr(sqlite3, "SQLITE_RECURSIVE", 33)}
+_DENIED_FUNCTIONS = {"load_extension", "readfile", "writefile", "randomblob", "zeroblob"}
+
+
+def _authorizer(action, arg1, arg2, db_name, trigger):
+    if action not in _ALLOWED_ACTIONS:
+        return sqlite3.SQLITE_DENY
+    if action == sqlite3.SQLITE_FUNCTION and (arg2 or "").lower() in _DENIED_FUNCTIONS:
+        return sqlite3.SQLITE_DENY
+    return sqlite3.SQLITE_OK
+
+
+def _row_bytes(row):
+    return sum(len(v) if isinstance(v, (str, bytes)) else 8 for v in row)
+
+
+def is_heavy(conn, sql):
+    # same definition of a full scan as the migration plan checker
+    return bool(full_scans(explain(conn, sql)))
+
+
+def unique_columns(names):
+    # SELECT * over a join repeats shared columns (product_code); suffix the
+    # repeats as pandas' readers do (product_code, product_code.1, ...)
+    seen, out = set(), []
+    for name in names:
+        candidate, i = name, 0
+        while candidate in seen:
+            i += 1
+            candidate = f"{name}.{i}"
+        seen.add(candidate)
+        out.append(candidate)
+    return out
+
+
+def _fetch(conn, sql, max_rows, max_bytes):
+    cur = conn.execute(sql)
+    try:
+        if cur.description is None:
+            raise ValueError("only queries that return rows are allowed")
+        columns = unique_columns([d[0] for d in cur.description])
+        rows, size, truncated = [], 0, None
+        while truncated is None:
+            batch = cur.fetchmany(FETCH_BATCH)
+            if not batch:
+                break
+            for row in batch:
+                if len(rows) >= max_rows:
+                    truncated = "rows"
+                    break
+                size += _row_bytes(row)
+                if size > max_bytes:
+                    truncated = "bytes"
+                    break
+                rows.append(row)
+    finally:
+        # also when the progress handler interrupts a step, so the pooled
+        # connection isn't left holding an open statement
+        cur.close()
+    return columns, rows, size, truncated
+
+
+# ----------------- Guarded Execution -----------------
+def run_guarded(conn, sql, cancel=None, budget=TIME_BUDGET_S, max_rows=MAX_ROWS, max_bytes=MAX_BYTES):
+    # Runs one SELECT under a deadline and result caps. Returns a dict with
+    # columns, rows, bytes, elapsed_s, truncated ("rows"/"bytes"/None) and
+    # heavy (whether it needed a scan slot). Raises TimeoutError,
+    # QueryCancelled, or ValueError for statements the console does not allow.
+    cancel = cancel or threading.Event()
+    start = time.monotonic()
+    deadline = start + budget
+    trial = {"steps": None}  # VM steps left in the slot-free trial, if one is running
+
+    def progress():
+        # a non-zero return makes SQLite abort with "interrupted"
+        if cancel.is_set() or time.monotonic() > deadline:
+            return 1
+        if trial["steps"] is not None:
+            trial["steps"] -= PROGRESS_STEPS
+            return 1 if trial["steps"] < 0 else 0
+        return 0
+
+    conn.set_authorizer(_authorizer)
+    conn.set_progress_handler(progress, PROGRESS_STEPS)
+    # the byte cap below is checked per finished row; this stops any single
+    # value (printf padding, group_concat, ...) growing past it first
+    max_length = conn.setlimit(sqlite3.SQLITE_LIMIT_LENGTH, max_bytes)
+    slot = False
+    try:
+        try:
+            heavy = is_heavy(conn, sql)
+        except sqlite3.DatabaseError as e:
+            if "not authorized" in str(e):
+                raise ValueError(f"only SELECT statements are allowed in the console ({e})") from None
+            raise ValueError(f"query rejected: {e}") from None
+        result = None
+        if heavy:
+            trial["steps"] = TRIAL_STEPS
+            try:
+                result = _fetch(conn, sql, max_rows, max_bytes)
+                heavy = False
+            except sqlite3.OperationalError as e:
+                if "interrupted" not in str(e) or trial["steps"] >= 0:
+                    raise
+            trial["steps"] = None
+        if result is None:
+            if heavy:
+                slot = _heavy_slots.acquire(timeout=HEAVY_WAIT_S)
+                if not slot:
+                    raise RuntimeError(f"{MAX_HEAVY_QUERIES} full-scan queries are already running; try again shortly")
+                # time spent waiting for the slot doesn't count against the budget
+                start = time.monotonic()
+                deadline = start + budget
+            result = _fetch(conn, sql, max_rows, max_bytes)
+        columns, rows, size, truncated = result
+    except sqlite3.DataError as e:
+        if "too big" not in str(e):
+            raise
+        raise ValueError(f"a value in the result is larger than the {max_bytes:,}-byte cap") from None
+    except sqlite3.OperationalError as e:
+        if "interrupted" not in str(e):
+            raise
+        if cancel.is_set():
+            raise QueryCancelled("query cancelled") from None
+        raise TimeoutError(f"query exceeded the {budget:g}s time budget") from None
+    finally:
+        if slot:
+            _heavy_slots.release()
+        conn.setlimit(sqlite3.SQLITE_LIMIT_LENGTH, max_length)
+        conn.set_progress_handler(None, 0)
+        conn.set_authorizer(None)
+    return {"columns": columns, "rows": rows, "bytes": size, "elapsed_s": time.monotonic() - start,
+            "truncated": truncated, "heavy": heavy}
+
+
+def submit(sql, cancel, db_path=DB_PATH, **limits):
+    # runs on a console worker thread with its own read-only connection, so
+    # the caller can keep polling (and be interrupted) while SQLite works.
+    # When every worker is busy the returned future has already failed with
+    # RuntimeError.
+    if not _worker_permits.acquire(blocking=False):
+        busy = Future()
+        busy.set_exception(RuntimeError(f"the console is already running {CONSOLE_WORKERS} queries; "
+                                        f"try again shortly"))
+        return busy
+
+    def work():
+        try:
+            conn = connect_readonly(db_path)
+            try:
+                return run_guarded(conn, sql, cancel, **limits)
+            finally:
+                conn.close()
+        finally:
+            _worker_permits.release()
+    try:
+        return _executor.submit(work)
+    except BaseException:
+        _worker_permits.release()
+        raise
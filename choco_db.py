@@ -0,0 +1,216 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+
+import pandas as pd
+
+from choco_dtypes import apply_dtypes
+
+DB_PATH = "chocolates.db"
+
+
+# ----------------- Database Version Stamp -----------------
+def db_version(path=DB_PATH):
+    # inode changes when the file is rebuilt and swapped in, mtime/size when it
+    # is written in place; the -wal file covers commits not yet checkpointed
+    st = os.stat(path)
+    stamp = (st.st_ino, st.st_mtime_ns, st.st_size)
+    wal = f"{path}-wal"
+    if os.path.exists(wal):
+        wst = os.stat(wal)
+        stamp += (wst.st_mtime_ns, wst.st_size)
+    return stamp
+
+
+# ----------------- Pooled Read-Only Connections -----------------
+def connect_readonly(path=DB_PATH):
+    uri = Path(path).resolve().as_uri() + "?mode=ro"
+    return sqlite3.connect(uri, uri=True, check_same_thread=False)
+
+
+class ConnectionPool:
+    def __init__(self, path=DB_PATH, size=4):
+        self.path = path
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._inode = None
+
+    def _current_inode(self):
+        return os.stat(self.path).st_ino
+
+    @contextmanager
+    def connection(self):
+        self._slots.acquire()
+        try:
+            inode = self._current_inode()
+            with self._lock:
+                if inode != self._inode:
+                    # database file was replaced: drop connections to the old one
+                    self._drain()
+                    self._inode = inode
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = connect_readonly(self.path)
+            try:
+                yield conn
+            finally:
+                with self._lock:
+                    stale = inode != self._inode
+                if stale:
+                    conn.close()
+                else:
+                    self._idle.put(conn)
+        finally:
+            self._slots.release()
+
+    def _drain(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def close(self):
+        with self._lock:
+            self._drain()
+            self._inode = None
+
+
+def stream_query(conn, sql, params=(), chunk_rows=50_000):
+    # DataFrames of up to chunk_rows rows straight from a cursor, for reads
+    # too big to hold (or cache) in one piece
+    cur = conn.execute(sql, params)
+    try:
+        columns = [d[0] for d in cur.description]
+        while True:
+            batch = cur.fetchmany(chunk_rows)
+            if not batch:
+                return
+            yield pd.DataFrame.from_records(batch, columns=columns)
+    finally:
+        cur.close()
+
+
+# ----------------- Cached Query Execution -----------------
+class QueryCache:
+    # results are shared between sessions, so callers must not mutate them.
+    # `observer(sql, params, elapsed_s, rows, size, hit)` is called after
+    # every run, e.g. PerfRecorder.on_query.
+    def __init__(self, pool, max_entries=128, max_bytes=256 * 1024 * 1024, observer=None):
+        self.pool = pool
+        self.observer = observer
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._version = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def run(self, sql, params=(), dtypes=None):
+        # dtypes (column -> dtype, see choco_dtypes) are applied before the
+        # result is cached, so the shared copy is the compact one
+        start = time.perf_counter()
+        version = db_version(self.pool.path)
+        key = (sql, tuple(params), tuple(sorted((dtypes or {}).items())))
+        cached = self._lookup(key, version)
+        if cached is not None:
+            df, size = cached
+            self._observe(sql, params, start, df, size, True)
+            return df
+
+        with self.pool.connection() as conn:
+            df = pd.read_sql_query(sql, conn, params=params)
+        if dtypes:
+            df = apply_dtypes(df, dtypes)
+        size = self._store(key, version, df)
+        self._observe(sql, params, start, df, size, False)
+        return df
+
+    def stream(self, sql, params=(), chunk_rows=50_000):
+        # uncached: chunks go straight from a pooled connection to the caller,
+        # and the observer sees the whole stream as one query
+        start = time.perf_counter()
+        rows = size = 0
+        with self.pool.connection() as conn:
+            for chunk in stream_query(conn, sql, params, chunk_rows):
+                rows += len(chunk)
+                size += int(chunk.memory_usage(deep=True).sum())
+                yield chunk
+        if self.observer is not None:
+            self.observer(sql, params, time.perf_counter() - start, rows, size, False)
+
+    def memo(self, label, compute):
+        # caches a DataFrame computed from other queries (e.g. a correlation
+        # matrix from streamed chunks) under `label`, invalidated with the
+        # rest of the cache; only hits are observed, the queries behind a
+        # miss report themselves
+        start = time.perf_counter()
+        version = db_version(self.pool.path)
+        key = ("memo", label)
+        cached = self._lookup(key, version)
+        if cached is not None:
+            df, size = cached
+            self._observe(label, (), start, df, size, True)
+            return df
+        df = compute()
+        self._store(key, version, df)
+        return df
+
+    def _lookup(self, key, version):
+        with self._lock:
+            if version != self._version:
+                self._clear()
+                self._version = version
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return None
+
+    def _store(self, key, version, df):
+        size = int(df.memory_usage(deep=True).sum())
+        with self._lock:
+            # skip results that are too big to be worth holding, and results
+            # computed against a version that was superseded while we ran
+            if size <= self.max_bytes and version == self._version and key not in self._entries:
+                self._entries[key] = (df, size)
+                self._bytes += size
+                self._evict()
+        return size
+
+    def _observe(self, sql, params, start, df, size, hit):
+        if self.observer is not None:
+            self.observer(sql, params, time.perf_counter() - start, len(df), size, hit)
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            _, (_, size) = self._entries.popitem(last=False)
+            self._bytes -= size
+
+    def _clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def clear(self):
+        with self._lock:
+            self._clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
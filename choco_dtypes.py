@@ -0,0 +1,101 @@
+import argparse
+import sqlite3
+import sys
+
+import pandas as pd
+
+# ----------------- Schema-Driven Dtypes -----------------
+# Text columns with a handful of distinct values become categoricals (one
+# small integer code per row instead of a Python str object), nutrient
+# values float32, and the small integer scores nullable Int8.
+CATEGORY_COLUMNS = {"brand", "calorie_category", "sugar_category", "is_ultra_processed"}
+SMALL_INT_COLUMNS = {"nova_group": "Int8", "nutrition_score_fr": "Int8"}
+FLOAT_DTYPE = "float32"
+INT_DTYPE = "Int64"
+# other text columns are made categorical when this few values are distinct
+CATEGORY_MAX_RATIO = 0.5
+
+
+def column_dtype(name, decl):
+    if name in SMALL_INT_COLUMNS:
+        return SMALL_INT_COLUMNS[name]
+    if name in CATEGORY_COLUMNS:
+        return "category"
+    decl = (decl or "").upper()
+    if "INT" in decl:
+        return INT_DTYPE
+    if any(t in decl for t in ("REAL", "FLOA", "DOUB")):
+        return FLOAT_DTYPE
+    return None
+
+
+def table_dtypes(declared):
+    # declared: [(column, decltype)], e.g. from choco_export.table_columns
+    return {name: dtype for name, decl in declared if (dtype := column_dtype(name, decl))}
+
+
+def apply_dtypes(df, dtypes, auto_category=True):
+    # Returns a new frame; a column whose values don't fit its dtype (text in
+    # a FLOAT column, a fractional score) keeps the type pandas inferred.
+    out = {}
+    for col in df.columns:
+        s = df[col]
+        dtype = dtypes.get(col)
+        # text loads as object or, under pandas 3, as the str dtype
+        if (dtype is None and auto_category and len(s)
+                and (pd.api.types.is_object_dtype(s) or pd.api.types.is_string_dtype(s))
+                and s.nunique(dropna=True) <= CATEGORY_MAX_RATIO * len(s)):
+            dtype = "category"
+        if dtype is not None and str(s.dtype) != dtype:
+            try:
+                s = s.astype(dtype)
+            except (TypeError, ValueError, OverflowError):
+                pass
+        out[col] = s
+    return pd.DataFrame(out, index=df.index)
+
+
+def memory_bytes(df):
+    return int(df.memory_usage(deep=True).sum())
+
+
+# ----------------- Memory Report -----------------
+def memory_report(conn, tables=None):
+    # loads each table with default and with schema-driven dtypes
+    if tables is None:
+        tables = [row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%' ORDER BY name")]
+    rows = []
+    for table in tables:
+        declared = [(r[1], r[2]) for r in conn.execute(f'PRAGMA table_info("{table}")')]
+        df = pd.read_sql_query(f'SELECT * FROM "{table}"', conn)
+        before = memory_bytes(df)
+        compact = apply_dtypes(df, table_dtypes(declared))
+        after = memory_bytes(compact)
+        rows.append({
+            "table": table, "rows": len(df), "default_bytes": before, "compact_bytes": after,
+            "saving_pct": round(100 * (1 - after / before), 1) if before else 0.0,
+            "dtypes": ", ".join(f"{c}:{t}" for c, t in compact.dtypes.astype(str).items()),
+        })
+        del df, compact
+    return pd.DataFrame(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-table DataFrame memory with default vs. compact dtypes.")
+    parser.add_argument("--db", default="chocolates.db")
+    parser.add_argument("tables", nargs="*")
+    args = parser.parse_args(argv)
+
+    report = memory_report(sqlite3.connect(args.db), args.tables or None)
+    for r in report.itertuples(index=False):
+        print(f"{r.table:<20} {r.rows:>10,} rows  {r.default_bytes / 2**20:9.1f} MiB -> "
+              f"{r.compact_bytes / 2**20:9.1f} MiB  ({r.saving_pct:.1f}% smaller)")
+        print(f"    {r.dtypes}")
+    total_before, total_after = report["default_bytes"].sum(), report["compact_bytes"].sum()
+    print(f"{'total':<20} {'':>15}  {total_before / 2**20:9.1f} MiB -> {total_after / 2**20:9.1f} MiB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,167 @@
+import csv
+import gzip
+import io
+import json
+
+CHUNK_SIZE = 5000
+
+EXPORT_FORMATS = {
+    "CSV": {"ext": "csv", "mime": "text/csv"},
+    "CSV (gzip)": {"ext": "csv.gz", "mime": "application/gzip"},
+    "Parquet": {"ext": "parquet", "mime": "application/vnd.apache.parquet"},
+    "JSON Lines": {"ext": "jsonl", "mime": "application/x-ndjson"},
+}
+
+
+# ----------------- Chunked Reads -----------------
+def iter_chunks(conn, sql, params=(), chunk_size=CHUNK_SIZE):
+    cur = conn.execute(sql, params)
+    try:
+        columns = [d[0] for d in cur.description]
+        while True:
+            rows = cur.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield columns, rows
+    finally:
+        cur.close()
+
+
+def table_columns(conn, table):
+    return [(row[1], row[2]) for row in conn.execute(f'PRAGMA table_info("{table}")')]
+
+
+# ----------------- Keyset Pagination -----------------
+def fetch_page(conn, table, after=None, page_size=100, key="product_code"):
+    # pages are ordered by (key, rowid); `after` is the (key, rowid) of the last
+    # row on the previous page. The row-value comparison lets SQLite seek the
+    # key index (SEARCH ... (key>?)); an equivalent OR of two predicates makes
+    # it walk the index from the start, i.e. OFFSET cost again.
+    where, params = "", []
+    if after is not None:
+        last_key, last_rowid = after
+        if last_key is None:
+            # NULL keys sort first and don't compare as row values
+            where = f"WHERE {key} IS NOT NULL OR ({key} IS NULL AND rowid > ?)"
+            params = [last_rowid]
+        else:
+            where = f"WHERE ({key}, rowid) > (?, ?)"
+            params = [last_key, last_rowid]
+    sql = f"SELECT rowid AS _rowid, * FROM {table} {where} ORDER BY {key}, rowid LIMIT ?;"
+    cur = conn.execute(sql, params + [page_size])
+    columns = [d[0] for d in cur.description]
+    rows = cur.fetchall()
+    cursor = None
+    if len(rows) == page_size:
+        last = dict(zip(columns, rows[-1]))
+        cursor = (last.get(key, last["_rowid"]), last["_rowid"])
+    return columns[1:], [r[1:] for r in rows], cursor
+
+
+# ----------------- Streaming Writers -----------------
+def write_csv(conn, sql, dest, params=(), chunk_size=CHUNK_SIZE):
+    text = io.TextIOWrapper(dest, encoding="utf-8", newline="", write_through=True)
+    writer = csv.writer(text, lineterminator="\n")
+    wrote_header = False
+    n = 0
+    for columns, rows in iter_chunks(conn, sql, params, chunk_size):
+        if not wrote_header:
+            writer.writerow(columns)
+            wrote_header = True
+        writer.writerows(rows)
+        n += len(rows)
+    if not wrote_header:
+        cur = conn.execute(sql, params)
+        writer.writerow([d[0] for d in cur.description])
+        cur.close()
+    text.detach()
+    return n
+
+
+def write_csv_gzip(conn, sql, dest, params=(), chunk_size=CHUNK_SIZE):
+    with gzip.GzipFile(fileobj=dest, mode="wb") as gz:
+        return write_csv(conn, sql, gz, params, chunk_size)
+
+
+SQLITE_TO_ARROW = {"TEXT": "string", "INTEGER": "int64", "INT": "int64", "FLOAT": "float64", "REAL": "float64"}
+
+
+def arrow_schema(pa, columns, rows, declared=None):
+    fields = []
+    for i, col in enumerate(columns):
+        decl = (declared or {}).get(col, "").upper()
+        if decl in SQLITE_TO_ARROW:
+            fields.append(pa.field(col, SQLITE_TO_ARROW[decl]))
+            continue
+        sample = next((r[i] for r in rows if r[i] is not None), None)
+        if isinstance(sample, bool) or isinstance(sample, int):
+            fields.append(pa.field(col, pa.int64()))
+        elif isinstance(sample, float):
+            fields.append(pa.field(col, pa.float64()))
+        elif isinstance(sample, bytes):
+            fields.append(pa.field(col, pa.binary()))
+        else:
+            fields.append(pa.field(col, pa.string()))
+    return pa.schema(fields)
+
+
+def arrow_column(pa, values, field):
+    try:
+        return pa.array(values, type=field.type)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # SQLite is dynamically typed: fall back to a lossless-enough coercion
+        if pa.types.is_integer(field.type) or pa.types.is_floating(field.type):
+            return pa.array([None if v in (None, "") else float(v) for v in values]).cast(field.type, safe=False)
+        return pa.array([None if v is None else str(v) for v in values], type=pa.string())
+
+
+def write_jsonl(conn, sql, dest, params=(), chunk_size=CHUNK_SIZE):
+    # one JSON object per row; bytes that aren't valid JSON types are
+    # written as their str() form
+    n = 0
+    for columns, rows in iter_chunks(conn, sql, params, chunk_size):
+        lines = (json.dumps(dict(zip(columns, row)), ensure_ascii=False, default=str) for row in rows)
+        dest.write(("\n".join(lines) + "\n").encode("utf-8"))
+        n += len(rows)
+    return n
+
+
+def write_parquet(conn, sql, dest, params=(), chunk_size=CHUNK_SIZE, declared=None):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)")
+
+    writer = None
+    n = 0
+    try:
+        for columns, rows in iter_chunks(conn, sql, params, chunk_size):
+            if writer is None:
+                schema = arrow_schema(pa, columns, rows, declared)
+                writer = pq.ParquetWriter(dest, schema, compression="snappy")
+            arrays = [arrow_column(pa, [r[i] for r in rows], schema.field(i)) for i in range(len(columns))]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            n += len(rows)
+        if writer is None:
+            cur = conn.execute(sql, params)
+            columns = [d[0] for d in cur.description]
+            cur.close()
+            schema = arrow_schema(pa, columns, [], declared)
+            writer = pq.ParquetWriter(dest, schema)
+    finally:
+        if writer is not None:
+            writer.close()
+    return n
+
+
+def export(conn, sql, dest, fmt="CSV", params=(), chunk_size=CHUNK_SIZE, declared=None):
+    if fmt == "CSV":
+        return write_csv(conn, sql, dest, params, chunk_size)
+    if fmt == "CSV (gzip)":
+        return write_csv_gzip(conn, sql, dest, params, chunk_size)
+    if fmt == "Parquet":
+        return write_parquet(conn, sql, dest, params, chunk_size, declared)
+    if fmt == "JSON Lines":
+        return write_jsonl(conn, sql, dest, params, chunk_size)
+    raise ValueError(f"Unknown export format: {fmt}")
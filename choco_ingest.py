@@ -0,0 +1,235 @@
+import argparse
+import csv
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+import requests
+
+API_URL = "https://world.openfoodfacts.org/api/v2/search"
+DEFAULT_FIELDS = "code,product_name,brands,nutriments"
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+# ----------------- Rate Limiting -----------------
+class RateLimiter:
+    # spaces request starts evenly across all worker threads
+    def __init__(self, per_second):
+        self.interval = 1.0 / per_second if per_second else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+# ----------------- Search API Client -----------------
+class SearchClient:
+    def __init__(self, base_url=API_URL, category="chocolate", fields=DEFAULT_FIELDS,
+                 page_size=100, rate=5.0, retries=5, backoff=1.0, timeout=30):
+        self.base_url = base_url
+        self.category = category
+        self.fields = fields
+        self.page_size = page_size
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.limiter = RateLimiter(rate)
+        self._local = threading.local()
+
+    @property
+    def session(self):
+        # requests.Session is not thread-safe, so each worker gets its own
+        if not hasattr(self._local, "session"):
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def params(self, page, **extra):
+        params = {"categories": self.category, "fields": self.fields,
+                  "page_size": self.page_size, "page": page}
+        params.update(extra)
+        return params
+
+    def fetch_page(self, page, **extra):
+        for attempt in range(self.retries + 1):
+            self.limiter.wait()
+            try:
+                response = self.session.get(self.base_url, params=self.params(page, **extra), timeout=self.timeout)
+                if response.status_code not in RETRY_STATUSES:
+                    response.raise_for_status()
+                    return response.json()
+                retry_after = response.headers.get("Retry-After")
+                error = requests.HTTPError(f"HTTP {response.status_code} for page {page}", response=response)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                retry_after, error = None, e
+            if attempt == self.retries:
+                raise error
+            delay = self.backoff * 2 ** attempt + random.uniform(0, self.backoff)
+            if retry_after and retry_after.isdigit():
+                delay = max(delay, int(retry_after))
+            time.sleep(delay)
+
+
+# ----------------- Checkpointed Page Store -----------------
+# Each fetched page is written to its own file via an atomic rename, so the set
+# of page files on disk *is* the checkpoint: a rerun skips pages that exist.
+class PageStore:
+    def __init__(self, out_dir, client):
+        self.dir = Path(out_dir) / "pages"
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.state_path = Path(out_dir) / "checkpoint.json"
+        self.query = {"base_url": client.base_url, "category": client.category,
+                      "fields": client.fields, "page_size": client.page_size}
+        self.state = {"query": self.query, "total_pages": None, "end_page": None}
+        if self.state_path.exists():
+            saved = json.loads(self.state_path.read_text())
+            if saved.get("query") != self.query:
+                raise ValueError(f"{self.state_path} was written for a different query; use a new output directory")
+            self.state = saved
+
+    def save_state(self):
+        tmp = self.state_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.state, indent=2))
+        os.replace(tmp, self.state_path)
+
+    def page_path(self, page):
+        return self.dir / f"page_{page:05d}.jsonl"
+
+    def has_page(self, page):
+        return self.page_path(page).exists()
+
+    def write_page(self, page, products):
+        path = self.page_path(page)
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            for product in products:
+                f.write(json.dumps(product, ensure_ascii=False) + "\n")
+        os.replace(tmp, path)
+
+    def iter_products(self, last_page):
+        for page in range(1, last_page + 1):
+            path = self.page_path(page)
+            if not path.exists():
+                continue
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    yield json.loads(line)
+
+
+# ----------------- Concurrent Ingestion -----------------
+def fetch_pages(client, pages, concurrency=4, **extra):
+    # yields (page, payload) in completion order; extra overrides query params
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = {pool.submit(client.fetch_page, page, **extra): page for page in pages}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+
+def ingest(client, out_dir, max_pages=None, concurrency=4, log=print):
+    store = PageStore(out_dir, client)
+
+    # page 1 tells us how many pages there are
+    if store.state["total_pages"] is None:
+        first = client.fetch_page(1)
+        products = first.get("products", [])
+        store.write_page(1, products)
+        total = math.ceil(first.get("count", 0) / client.page_size) if products else 0
+        store.state["total_pages"] = total
+        if not products:
+            store.state["end_page"] = 0
+        store.save_state()
+
+    last_page = store.state["total_pages"]
+    if max_pages:
+        last_page = min(last_page, max_pages)
+    if store.state["end_page"] is not None:
+        last_page = min(last_page, store.state["end_page"])
+
+    todo = [p for p in range(1, last_page + 1) if not store.has_page(p)]
+    log(f"{last_page - len(todo)} of {last_page} pages already on disk, fetching {len(todo)}")
+
+    end_page = None
+    for page, payload in fetch_pages(client, todo, concurrency):
+        if end_page is not None and page > end_page:
+            continue
+        products = payload.get("products", [])
+        if not products:
+            # the result set ended early: nothing past this page exists
+            end_page = page - 1 if end_page is None else min(end_page, page - 1)
+            continue
+        store.write_page(page, products)
+        log(f"page {page}: {len(products)} products")
+
+    if end_page is not None:
+        store.state["end_page"] = end_page
+        store.save_state()
+        last_page = min(last_page, end_page)
+    return store, last_page
+
+
+# ----------------- Streaming Output -----------------
+def write_output(store, last_page, output):
+    # one product at a time from the page files; only product codes are kept
+    # in memory, to drop duplicates when the result set shifts between pages
+    output = Path(output)
+    tmp = output.with_name(output.name + ".tmp")
+    columns = store.query["fields"].split(",")
+    seen = set()
+    n = 0
+    with open(tmp, "w", encoding="utf-8", newline="") as f:
+        writer = None
+        if output.suffix == ".csv":
+            writer = csv.writer(f)
+            writer.writerow(columns)
+        for product in store.iter_products(last_page):
+            code = product.get("code")
+            if code in seen:
+                continue
+            seen.add(code)
+            if writer:
+                writer.writerow([
+                    json.dumps(v, ensure_ascii=False) if isinstance(v, (dict, list)) else v
+                    for v in (product.get(c) for c in columns)
+                ])
+            else:
+                f.write(json.dumps(product, ensure_ascii=False) + "\n")
+            n += 1
+    os.replace(tmp, output)
+    return n
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Download OpenFoodFacts chocolate products.")
+    parser.add_argument("--out-dir", default="ingest", help="checkpoint directory (rerun to resume)")
+    parser.add_argument("--output", default="chocolates.jsonl", help=".jsonl or .csv")
+    parser.add_argument("--base-url", default=API_URL)
+    parser.add_argument("--category", default="chocolate")
+    parser.add_argument("--fields", default=DEFAULT_FIELDS)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--max-pages", type=int, default=121)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=5.0, help="max requests per second")
+    parser.add_argument("--retries", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    client = SearchClient(args.base_url, args.category, args.fields, args.page_size,
+                          rate=args.rate, retries=args.retries)
+    store, last_page = ingest(client, args.out_dir, args.max_pages, args.concurrency)
+    n = write_output(store, last_page, args.output)
+    print(f"Total records collected: {n}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
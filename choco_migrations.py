@@ -0,0 +1,229 @@
+import argparse
+import re
+import sqlite3
+import sys
+
+from choco_db import DB_PATH
+from choco_queries import queries
+from choco_rollups import FRESHNESS_SCHEMA, MARK_FRESH, ROLLUP_SCHEMA, rebuild_statements
+
+# ----------------- Base Schema (as created by the notebook) -----------------
+BASE_SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS product_info (
+        product_code TEXT PRIMARY KEY,
+        product_name TEXT,
+        brand TEXT)''',
+    '''CREATE TABLE IF NOT EXISTS nutrient_info (
+        product_code TEXT,
+        energy_kcal_value FLOAT,
+        energy_kj_value FLOAT,
+        carbohydrates_value FLOAT,
+        sugars_value FLOAT,
+        fat_value FLOAT,
+        saturated_fat_value FLOAT,
+        proteins_value FLOAT,
+        fiber_value FLOAT,
+        salt_value FLOAT,
+        sodium_value FLOAT,
+        fruits_vegetables_nuts_estimate_100g FLOAT,
+        nutrition_score_fr INTEGER,
+        nova_group INTEGER,
+        FOREIGN KEY (product_code) REFERENCES product_info(product_code))''',
+    '''CREATE TABLE IF NOT EXISTS derived_metrics (
+        product_code TEXT,
+        sugar_to_carb_ratio FLOAT,
+        calorie_category TEXT,
+        sugar_category TEXT,
+        is_ultra_processed TEXT,
+        FOREIGN KEY (product_code) REFERENCES product_info(product_code))''',
+]
+
+# ----------------- Indexes for the Predefined Workload -----------------
+# Kept separate so a bulk load can drop them and rebuild after inserting.
+INDEXES = {
+    "idx_product_brand": "CREATE INDEX IF NOT EXISTS idx_product_brand ON product_info (brand, product_name)",
+    "idx_product_name": "CREATE INDEX IF NOT EXISTS idx_product_name ON product_info (product_name)",
+    "idx_nutrient_energy": "CREATE INDEX IF NOT EXISTS idx_nutrient_energy ON nutrient_info (energy_kcal_value)",
+    "idx_nutrient_nova_sugars": "CREATE INDEX IF NOT EXISTS idx_nutrient_nova_sugars ON nutrient_info (nova_group, sugars_value)",
+    "idx_nutrient_fat": "CREATE INDEX IF NOT EXISTS idx_nutrient_fat ON nutrient_info (fat_value)",
+    "idx_nutrient_carbs": "CREATE INDEX IF NOT EXISTS idx_nutrient_carbs ON nutrient_info (carbohydrates_value)",
+    "idx_nutrient_sodium": "CREATE INDEX IF NOT EXISTS idx_nutrient_sodium ON nutrient_info (sodium_value)",
+    "idx_nutrient_fvn": "CREATE INDEX IF NOT EXISTS idx_nutrient_fvn ON nutrient_info (fruits_vegetables_nuts_estimate_100g)",
+    "idx_derived_calorie": "CREATE INDEX IF NOT EXISTS idx_derived_calorie ON derived_metrics (calorie_category, sugar_category, sugar_to_carb_ratio, product_code)",
+    "idx_derived_sugar": "CREATE INDEX IF NOT EXISTS idx_derived_sugar ON derived_metrics (sugar_category, calorie_category)",
+    "idx_derived_ultra": "CREATE INDEX IF NOT EXISTS idx_derived_ultra ON derived_metrics (is_ultra_processed, product_code)",
+    "idx_derived_ratio": "CREATE INDEX IF NOT EXISTS idx_derived_ratio ON derived_metrics (sugar_to_carb_ratio)",
+}
+
+
+def _rekey(table, columns_ddl):
+    # SQLite can't add a primary key in place: copy into a keyed table,
+    # keeping the most recently inserted row for each product_code
+    return [
+        f"CREATE TABLE {table}_new ({columns_ddl})",
+        f"INSERT INTO {table}_new SELECT * FROM {table} "
+        f"WHERE rowid IN (SELECT MAX(rowid) FROM {table} GROUP BY product_code)",
+        f"DROP TABLE {table}",
+        f"ALTER TABLE {table}_new RENAME TO {table}",
+    ]
+
+
+# ----------------- Versioned Migrations -----------------
+# (version, description, statements); applied in order, tracked in PRAGMA user_version
+MIGRATIONS = [
+    (1, "primary keys on nutrient_info and derived_metrics",
+     _rekey("nutrient_info", '''
+        product_code TEXT PRIMARY KEY,
+        energy_kcal_value FLOAT,
+        energy_kj_value FLOAT,
+        carbohydrates_value FLOAT,
+        sugars_value FLOAT,
+        fat_value FLOAT,
+        saturated_fat_value FLOAT,
+        proteins_value FLOAT,
+        fiber_value FLOAT,
+        salt_value FLOAT,
+        sodium_value FLOAT,
+        fruits_vegetables_nuts_estimate_100g FLOAT,
+        nutrition_score_fr INTEGER,
+        nova_group INTEGER,
+        FOREIGN KEY (product_code) REFERENCES product_info(product_code)''')
+     + _rekey("derived_metrics", '''
+        product_code TEXT PRIMARY KEY,
+        sugar_to_carb_ratio FLOAT,
+        calorie_category TEXT,
+        sugar_category TEXT,
+        is_ultra_processed TEXT,
+        FOREIGN KEY (product_code) REFERENCES product_info(product_code)''')),
+    (2, "indexes for the predefined query workload", list(INDEXES.values()) + ["ANALYZE"]),
+    (3, "per-product change markers for incremental refresh", [
+        '''CREATE TABLE IF NOT EXISTS product_sync (
+            product_code TEXT PRIMARY KEY,
+            last_modified_t INTEGER,
+            content_hash TEXT,
+            synced_at INTEGER)''',
+    ]),
+    (4, "rollup tables for the aggregate queries", ROLLUP_SCHEMA + rebuild_statements()),
+    (5, "rollup freshness marker and base-table triggers",
+     FRESHNESS_SCHEMA + rebuild_statements() + [MARK_FRESH]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn, target=LATEST_VERSION):
+    for stmt in BASE_SCHEMA:
+        conn.execute(stmt)
+    conn.commit()
+    applied = []
+    for version, description, statements in MIGRATIONS:
+        if version <= current_version(conn) or version > target:
+            continue
+        # each migration is all-or-nothing, including the version bump
+        with conn:
+            conn.execute("BEGIN")
+            for stmt in statements:
+                conn.execute(stmt)
+            conn.execute(f"PRAGMA user_version = {version}")
+        applied.append((version, description))
+    return applied
+
+
+# ----------------- Query-Plan Checker -----------------
+# Any pass over a whole table counts, directly or through one of its indexes
+# (covering or not): both read every row. Rollup tables hold one row per
+# group and subqueries are not tables, so scanning those is expected. The SQL
+# console classifies heavy queries with the same rule.
+FULL_SCAN = re.compile(r"^SCAN (?!CONSTANT ROW|rollup_|\()(\S+)")
+
+
+# Base SQL that is allowed to scan, by query name. Whole-table aggregates are
+# answered from their rollup while it is fresh; the base SQL only runs as the
+# fallback. Index-ordered LIMIT queries stop after the first few rows.
+ROLLUP_FALLBACK = "whole-table aggregate; served from its rollup"
+INDEX_ORDERED_LIMIT = "walks an index in ORDER BY order and stops at the LIMIT"
+ALLOWED_SCANS = {
+    "product_info.count_products_per_brand": ROLLUP_FALLBACK,
+    "product_info.count_unique_products_per_brand": ROLLUP_FALLBACK,
+    "product_info.top5_brands_by_product_count": ROLLUP_FALLBACK,
+    "product_info.unique_brand_count": ROLLUP_FALLBACK,
+    "nutrient_info.top10_highest_energy": INDEX_ORDERED_LIMIT,
+    "nutrient_info.avg_sugars_per_nova": ROLLUP_FALLBACK,
+    "nutrient_info.avg_carbs_per_product": ROLLUP_FALLBACK,
+    "derived_metrics.count_per_calorie_category": ROLLUP_FALLBACK,
+    "derived_metrics.avg_ratio_per_calorie_category": ROLLUP_FALLBACK,
+    "join_queries.top5_brands_high_calorie": ROLLUP_FALLBACK,
+    "join_queries.avg_energy_per_calorie_category": ROLLUP_FALLBACK,
+    "join_queries.ultra_processed_per_brand": ROLLUP_FALLBACK,
+    "join_queries.fvn_per_calorie_category": ROLLUP_FALLBACK,
+    "join_queries.top5_products_by_ratio": INDEX_ORDERED_LIMIT,
+}
+
+
+def explain(conn, sql, params=()):
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+
+def full_scans(plan):
+    return [detail for detail in plan if FULL_SCAN.match(detail)]
+
+
+def check_query_plans(conn=None, catalog=queries):
+    # With no connection the check runs against an empty in-memory database at
+    # the latest schema version, so it only needs the schema, not the data.
+    if conn is None:
+        conn = sqlite3.connect(":memory:")
+        migrate(conn)
+    problems = []
+    for category, entries in catalog.items():
+        for key, query in entries.items():
+            for field in ("sql", "rollup"):
+                if field not in query:
+                    continue
+                name = f"{category}.{key}" + (" (rollup)" if field == "rollup" else "")
+                try:
+                    plan = explain(conn, query[field])
+                except sqlite3.Error as e:
+                    problems.append((name, f"invalid query: {e}"))
+                    continue
+                allowed = ALLOWED_SCANS.get(f"{category}.{key}") if field == "sql" else None
+                if allowed == ROLLUP_FALLBACK and "rollup" not in query:
+                    problems.append((name, "allowed to scan as a rollup fallback, but has no rollup"))
+                if allowed:
+                    continue
+                for detail in full_scans(plan):
+                    problems.append((name, f"full table scan: {detail}"))
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Migrate chocolates.db and check query plans.")
+    parser.add_argument("command", choices=["migrate", "check", "status"])
+    parser.add_argument("--db", help=f"database file (default {DB_PATH}; check uses an empty in-memory schema if omitted)")
+    args = parser.parse_args(argv)
+
+    if args.command == "check":
+        conn = sqlite3.connect(args.db) if args.db else None
+        problems = check_query_plans(conn)
+        for name, problem in problems:
+            print(f"FAIL {name}: {problem}")
+        print(f"{len(problems)} problem(s) in {sum(len(v) for v in queries.values())} queries")
+        return 1 if problems else 0
+
+    db = args.db or DB_PATH
+    conn = sqlite3.connect(db)
+    if args.command == "status":
+        print(f"{db}: schema version {current_version(conn)} (latest {LATEST_VERSION})")
+        return 0
+    for version, description in migrate(conn):
+        print(f"applied migration {version}: {description}")
+    print(f"{db}: schema version {current_version(conn)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,155 @@
+import json
+import logging
+import logging.handlers
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+
+from choco_migrations import explain
+
+PERF_LOG = "choco_perf.jsonl"
+SLOW_QUERY_LOG = "choco_slow_queries.jsonl"
+# process-wide, like the slow-query log it controls; not a per-session setting
+SLOW_QUERY_MS = int(os.environ.get("CHOCO_SLOW_QUERY_MS", "500"))
+MAX_EVENTS = 500
+# both logs rotate at this size, keeping this many old files (.1, .2, ...)
+LOG_MAX_BYTES = 20 * 1024 * 1024
+LOG_BACKUPS = 3
+
+logger = logging.getLogger("choco.perf")
+slow_logger = logging.getLogger("choco.perf.slow")
+
+
+def setup_logging(perf_log=PERF_LOG, slow_log=SLOW_QUERY_LOG):
+    # one JSON object per line; safe to call on every app rerun
+    for log, path in ((logger, perf_log), (slow_logger, slow_log)):
+        if path and not any(getattr(h, "baseFilename", None) == os.path.abspath(path) for h in log.handlers):
+            handler = logging.handlers.RotatingFileHandler(path, maxBytes=LOG_MAX_BYTES,
+                                                           backupCount=LOG_BACKUPS, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            log.addHandler(handler)
+        log.setLevel(logging.INFO)
+        log.propagate = False
+
+
+# ----------------- Recorder -----------------
+# Keeps the most recent events in memory for the performance sidebar and
+# writes every event to the structured log. Shared across sessions.
+class PerfRecorder:
+    def __init__(self, pool=None, slow_query_ms=SLOW_QUERY_MS, max_events=MAX_EVENTS):
+        self.pool = pool  # used to capture query plans for slow queries
+        self.slow_query_ms = slow_query_ms
+        self.events = deque(maxlen=max_events)
+        self.slow_queries = deque(maxlen=max_events)
+        self._lock = threading.Lock()
+
+    def record(self, kind, name, elapsed_ms, **fields):
+        # fields: rows, bytes, cache ("hit"/"miss") and anything else to log
+        event = {"ts": round(time.time(), 3), "kind": kind, "name": name, "elapsed_ms": round(elapsed_ms, 3),
+                 "rows": None, "bytes": None, "cache": None, **fields}
+        with self._lock:
+            self.events.append(event)
+        logger.info(json.dumps(event, default=str))
+        return event
+
+    @contextmanager
+    def span(self, kind, name, **fields):
+        # callers may fill in rows/bytes on the yielded dict
+        info = dict(fields)
+        start = time.perf_counter()
+        try:
+            yield info
+        finally:
+            self.record(kind, name, (time.perf_counter() - start) * 1000, **info)
+
+    def timed(self, kind="chart"):
+        # decorator for chart helpers; nested queries are recorded separately.
+        # A DataFrame argument is reported as the rows/bytes being plotted.
+        def decorate(fn):
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.span(kind, fn.__name__) as info:
+                    for arg in args:
+                        if hasattr(arg, "memory_usage"):
+                            info["rows"] = len(arg)
+                            info["bytes"] = int(arg.memory_usage(deep=True).sum())
+                            break
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    # ----------------- Queries -----------------
+    def on_query(self, sql, params, elapsed_s, rows, size, hit):
+        # QueryCache observer
+        elapsed_ms = elapsed_s * 1000
+        self.record("query", _one_line(sql), elapsed_ms, rows=rows, bytes=size,
+                    cache="hit" if hit else "miss", params=list(params))
+        if not hit and elapsed_ms >= self.slow_query_ms:
+            self.log_slow_query(sql, params, elapsed_ms, rows)
+
+    def log_slow_query(self, sql, params, elapsed_ms, rows=None):
+        plan = None
+        if self.pool is not None:
+            try:
+                with self.pool.connection() as conn:
+                    plan = explain(conn, sql, params)
+            except sqlite3.Error as e:
+                plan = [f"EXPLAIN failed: {e}"]
+        entry = {"ts": round(time.time(), 3), "sql": sql, "params": list(params),
+                 "elapsed_ms": round(elapsed_ms, 3), "rows": rows, "plan": plan}
+        with self._lock:
+            self.slow_queries.append(entry)
+        slow_logger.warning(json.dumps(entry, default=str))
+        return entry
+
+    # ----------------- Reporting -----------------
+    def snapshot(self, since=None):
+        # since: a time.time() value; earlier events are left out, so a
+        # session can "clear" its view without touching the shared recorder
+        with self._lock:
+            events, slow = list(self.events), list(self.slow_queries)
+        if since is not None:
+            events = [e for e in events if e["ts"] >= since]
+            slow = [e for e in slow if e["ts"] >= since]
+        return events, slow
+
+    def summary(self, since=None):
+        # per kind: count, p50/p95/max elapsed, rows, bytes and cache hit rate
+        events, _ = self.snapshot(since)
+        out = {}
+        for kind in sorted({e["kind"] for e in events}):
+            evs = [e for e in events if e["kind"] == kind]
+            times = sorted(e["elapsed_ms"] for e in evs)
+            # snapshot reads bypass the query cache: neither a hit nor a miss
+            cached = [e for e in evs if e["cache"] in ("hit", "miss")]
+            out[kind] = {
+                "count": len(evs),
+                "p50_ms": _percentile(times, 50),
+                "p95_ms": _percentile(times, 95),
+                "max_ms": times[-1],
+                "rows": sum(e["rows"] or 0 for e in evs),
+                "bytes": sum(e["bytes"] or 0 for e in evs),
+                "hit_rate": (sum(e["cache"] == "hit" for e in cached) / len(cached)) if cached else None,
+            }
+        return out
+
+    def clear(self):
+        with self._lock:
+            self.events.clear()
+            self.slow_queries.clear()
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    i = min(len(sorted_values) - 1, round(pct / 100 * (len(sorted_values) - 1)))
+    return sorted_values[i]
+
+
+def _one_line(sql, limit=200):
+    sql = " ".join(sql.split())
+    return sql if len(sql) <= limit else sql[:limit - 3] + "..."
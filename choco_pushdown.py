@@ -0,0 +1,320 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+from choco_dtypes import table_dtypes
+
+# rows per chunk when correlation() streams a table through numpy
+CORR_CHUNK_ROWS = 50_000
+
+
+def quote(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def column_kind(decl):
+    # SQLite type-affinity rules, collapsed to what the EDA helpers need
+    decl = (decl or "").upper()
+    if "INT" in decl:
+        return "numeric"
+    if any(t in decl for t in ("CHAR", "CLOB", "TEXT")):
+        return "categorical"
+    if not decl or "BLOB" in decl:
+        return "other"
+    return "numeric"
+
+
+# ----------------- SQL Push-Down Engine -----------------
+# Compiles the EDA aggregates into SQLite queries so only small results reach
+# pandas. `run(sql, params, dtypes=None)` returns a DataFrame, e.g.
+# QueryCache.run; row-level reads pass schema-driven dtypes. Reads that have
+# to see every row go through `stream(sql, params, chunk_rows)`, which yields
+# DataFrame chunks without caching them (QueryCache.stream), and their small
+# results are kept with `memo(label, compute)` (QueryCache.memo). Without
+# those, the whole read is one run() and nothing is memoised.
+class PushdownEngine:
+    def __init__(self, run, stream=None, memo=None):
+        self.run = run
+        self.stream = stream or (lambda sql, params=(), chunk_rows=None: iter([self.run(sql, params)]))
+        self.memo = memo or (lambda label, compute: compute())
+
+    def schema(self, table):
+        info = self.run(f"PRAGMA table_info({quote(table)});")
+        return [(row["name"], column_kind(row["type"])) for _, row in info.iterrows()]
+
+    def dtypes(self, table):
+        info = self.run(f"PRAGMA table_info({quote(table)});")
+        return table_dtypes(zip(info["name"], info["type"]))
+
+    def numeric_columns(self, table):
+        return [c for c, kind in self.schema(table) if kind == "numeric"]
+
+    def categorical_columns(self, table):
+        return [c for c, kind in self.schema(table) if kind == "categorical"]
+
+    def row_count(self, table):
+        return int(self.run(f"SELECT COUNT(*) AS n FROM {quote(table)};")["n"].iloc[0])
+
+    def missingness(self, table):
+        cols = [c for c, _ in self.schema(table)]
+        exprs = ", ".join(f"COUNT(*) - COUNT({quote(c)}) AS {quote(c)}" for c in cols)
+        res = self.run(f"SELECT COUNT(*) AS __rows, {exprs} FROM {quote(table)};")
+        total = int(res["__rows"].iloc[0])
+        miss_df = pd.DataFrame({"column": cols, "missing_count": [int(res[c].iloc[0]) for c in cols]})
+        miss_df = miss_df[miss_df["missing_count"] > 0].sort_values("missing_count", ascending=False)
+        miss_df["missing_pct"] = (miss_df["missing_count"] / total) * 100 if total else 0.0
+        return miss_df.reset_index(drop=True)
+
+    def value_range(self, table, col):
+        c = quote(col)
+        stats = self.run(f"SELECT MIN({c}) AS lo, MAX({c}) AS hi FROM {quote(table)};")
+        lo, hi = stats["lo"].iloc[0], stats["hi"].iloc[0]
+        if pd.isna(lo):
+            return None
+        return float(lo), float(hi)
+
+    def histogram(self, table, col, bins=30):
+        c = quote(col)
+        bounds = self.value_range(table, col)
+        if bounds is None:
+            return pd.DataFrame(columns=["bin_start", "bin_end", "count"])
+        lo, hi = bounds
+        width = (hi - lo) / bins if hi > lo else 1.0
+        res = self.run(
+            f"SELECT MIN(CAST(({c} - ?) / ? AS INTEGER), ?) AS bin, COUNT(*) AS count "
+            f"FROM {quote(table)} WHERE {c} IS NOT NULL GROUP BY bin ORDER BY bin;",
+            (lo, width, bins - 1),
+        )
+        counts = np.zeros(bins, dtype=np.int64)
+        counts[res["bin"].astype(int).to_numpy()] = res["count"].to_numpy()
+        edges = lo + width * np.arange(bins + 1)
+        return pd.DataFrame({"bin_start": edges[:-1], "bin_end": edges[1:], "count": counts})
+
+    def category_counts(self, table, cat_col, top_n=20):
+        c = quote(cat_col)
+        return self.run(
+            f"SELECT {c}, COUNT(*) AS count FROM {quote(table)} WHERE {c} IS NOT NULL "
+            f"GROUP BY {c} ORDER BY count DESC LIMIT ?;",
+            (int(top_n),),
+        )
+
+    def category_means(self, table, cat_col, metric_col, top_n=20):
+        c, m = quote(cat_col), quote(metric_col)
+        return self.run(
+            f"SELECT {c}, AVG({m}) AS {m} FROM {quote(table)} WHERE {c} IS NOT NULL "
+            f"GROUP BY {c} ORDER BY {m} DESC LIMIT ?;",
+            (int(top_n),),
+        )
+
+    def correlation(self, table, columns):
+        columns = list(columns)
+        return self.memo(f"correlation of {table}: {', '.join(columns)}",
+                         lambda: self._correlation(table, columns))
+
+    def _correlation(self, table, columns):
+        # Pearson over pairwise-complete rows (same as DataFrame.corr), from
+        # per-pair sums of pivot-shifted values accumulated in numpy over
+        # streamed chunks: all pairs cost one matrix product per chunk and
+        # memory is bounded by CORR_CHUNK_ROWS. (The same sums in SQL need a
+        # CASE per pair per row and were about ten times slower.)
+        k = len(columns)
+        pivots = np.array([np.nan if p is None else p for p in self.pivots(table, columns)], dtype=float)
+        n, sa, saa, sab = (np.zeros((k, k)) for _ in range(4))
+        sql = f"SELECT {', '.join(quote(c) for c in columns)} FROM {quote(table)};"
+        for chunk in self.stream(sql, (), CORR_CHUNK_ROWS):
+            x = chunk.apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float) - pivots
+            present = ~np.isnan(x)
+            z = np.where(present, x, 0.0)
+            m = present.astype(float)
+            n += m.T @ m
+            sa += z.T @ m  # [a, b]: sum of a over rows where b is present too
+            saa += (z * z).T @ m
+            sab += z.T @ z
+        var = n * saa - sa * sa
+        cov = n * sab - sa * sa.T
+        with np.errstate(divide="ignore", invalid="ignore"):
+            r = cov / np.sqrt(var * var.T)
+        r[(n < 2) | (var <= 0) | (var.T <= 0)] = np.nan
+        np.fill_diagonal(r, np.where(np.isnan(np.diag(r)), np.nan, 1.0))
+        return pd.DataFrame(np.clip(r, -1.0, 1.0), index=columns, columns=columns)
+
+    def pivots(self, table, columns):
+        # one of each column's own values, fetched once and bound as a
+        # parameter; sums of squares are taken around it so that large
+        # INTEGER values (timestamps) neither overflow nor cancel
+        t = quote(table)
+        row = self.run("SELECT " + ", ".join(
+            f"(SELECT {quote(c)} FROM {t} WHERE {quote(c)} IS NOT NULL LIMIT 1) AS {quote(c)}" for c in columns
+        ) + ";").iloc[0]
+        values = [row[c] for c in columns]
+        return [None if pd.isna(v) else v.item() if isinstance(v, np.generic) else v for v in values]
+
+    # ----------------- Downsampled Chart Data -----------------
+    # Summaries that replace point-level data for large tables: the result
+    # size depends on the number of bins or groups, not on the row count.
+    def density2d(self, table, x_col, y_col, bins=60):
+        qx, qy = quote(x_col), quote(y_col)
+        xb, yb = self.value_range(table, x_col), self.value_range(table, y_col)
+        columns = ["x_bin", "y_bin", "x_start", "x_end", "y_start", "y_end", "count"]
+        if xb is None or yb is None:
+            return pd.DataFrame(columns=columns)
+        xw = (xb[1] - xb[0]) / bins if xb[1] > xb[0] else 1.0
+        yw = (yb[1] - yb[0]) / bins if yb[1] > yb[0] else 1.0
+        res = self.run(
+            f"SELECT MIN(CAST(({qx} - ?) / ? AS INTEGER), ?) AS x_bin, "
+            f"MIN(CAST(({qy} - ?) / ? AS INTEGER), ?) AS y_bin, COUNT(*) AS count "
+            f"FROM {quote(table)} WHERE {qx} IS NOT NULL AND {qy} IS NOT NULL GROUP BY x_bin, y_bin;",
+            (xb[0], xw, bins - 1, yb[0], yw, bins - 1),
+        )
+        x_bin, y_bin = res["x_bin"].astype(int).to_numpy(), res["y_bin"].astype(int).to_numpy()
+        return pd.DataFrame({
+            "x_bin": x_bin, "y_bin": y_bin,
+            "x_start": xb[0] + xw * x_bin, "x_end": xb[0] + xw * (x_bin + 1),
+            "y_start": yb[0] + yw * y_bin, "y_end": yb[0] + yw * (y_bin + 1),
+            "count": res["count"].to_numpy(),
+        }, columns=columns)
+
+    def ols(self, table, x_col, y_col, group_col=None):
+        # least-squares line from sufficient statistics (n, sums, sums of
+        # squares and products) accumulated in one pass, per group if given.
+        # Values are shifted by pivots (px, py) and summed with TOTAL(), which
+        # sums as REAL where SUM() could overflow.
+        qx, qy = quote(x_col), quote(y_col)
+        px, py = self.pivots(table, [x_col, y_col])
+        group = f"{quote(group_col)} AS grp, " if group_col else ""
+        res = self.run(
+            f"SELECT {group}COUNT(*) AS n, ?1 AS px, ?2 AS py, "
+            f"TOTAL({qx} - ?1) AS sx, TOTAL({qy} - ?2) AS sy, TOTAL(({qx} - ?1) * ({qx} - ?1)) AS sxx, "
+            f"TOTAL(({qx} - ?1) * ({qy} - ?2)) AS sxy, MIN({qx}) AS x_min, MAX({qx}) AS x_max "
+            f"FROM {quote(table)} WHERE {qx} IS NOT NULL AND {qy} IS NOT NULL"
+            + (f" AND {quote(group_col)} IS NOT NULL GROUP BY grp;" if group_col else ";"),
+            (px, py),
+        )
+        n = res["n"].astype(float)
+        denom = n * res["sxx"] - res["sx"] ** 2
+        slope = (n * res["sxy"] - res["sx"] * res["sy"]) / denom.where(denom > 0)
+        fits = pd.DataFrame({
+            "group": res["grp"] if group_col else None,
+            "n": res["n"],
+            "slope": slope,
+            "intercept": (res["sy"] - slope * res["sx"]) / n + res["py"] - slope * res["px"],
+            "x_min": res["x_min"], "x_max": res["x_max"],
+        })
+        return fits[fits["n"] >= 2].dropna(subset=["slope"]).reset_index(drop=True)
+
+    def box_stats(self, table, num_col, cat_col=None, top_n=20):
+        # Tukey box summary (linear-interpolated quartiles, 1.5 IQR fences)
+        # for the top_n most frequent categories. Only the order-statistic
+        # rows each quartile needs leave SQLite.
+        v, t = quote(num_col), quote(table)
+        params = []
+        if cat_col:
+            c = quote(cat_col)
+            grp, part = c, f"PARTITION BY {c}"
+            where = (f"{v} IS NOT NULL AND {c} IN (SELECT {c} FROM {t} WHERE {c} IS NOT NULL "
+                     f"GROUP BY {c} ORDER BY COUNT(*) DESC LIMIT ?)")
+            params.append(int(top_n))
+        else:
+            grp, part, where = "NULL", "", f"{v} IS NOT NULL"
+        positions = ", ".join(f"CAST({q} * (n - 1) AS INTEGER) + {k}" for q in (0.25, 0.5, 0.75) for k in (1, 2))
+        ranked = self.run(
+            f"WITH ranked AS (SELECT {grp} AS grp, {v} AS v, ROW_NUMBER() OVER ({part} ORDER BY {v}) AS rn, "
+            f"COUNT(*) OVER ({part}) AS n FROM {t} WHERE {where}) "
+            f"SELECT grp, n, rn, v FROM ranked WHERE rn IN ({positions});",
+            tuple(params),
+        )
+        columns = ["group", "count", "q1", "median", "q3", "lowerfence", "upperfence", "mean", "outliers"]
+        if ranked.empty:
+            return pd.DataFrame(columns=columns)
+
+        stats = []
+        for g, rows in ranked.groupby("grp", dropna=False, sort=False):
+            n = int(rows["n"].iloc[0])
+            at = dict(zip(rows["rn"].astype(int), rows["v"].astype(float)))
+            q = []
+            for frac in (0.25, 0.5, 0.75):
+                pos = frac * (n - 1)
+                lo = math.floor(pos)
+                q.append(at[lo + 1] + (pos - lo) * (at[lo + 2] - at[lo + 1]) if lo + 2 <= n else at[lo + 1])
+            iqr = q[2] - q[0]
+            stats.append((g, n, q[0], q[1], q[2], q[0] - 1.5 * iqr, q[2] + 1.5 * iqr))
+
+        # fences are the most extreme values inside the 1.5 IQR bounds
+        if cat_col:
+            bounds = ", ".join("(?, ?, ?)" for _ in stats)
+            fences = self.run(
+                f"WITH b(grp, lo, hi) AS (VALUES {bounds}) "
+                f"SELECT b.grp AS grp, MIN(CASE WHEN {v} >= b.lo THEN {v} END) AS lowerfence, "
+                f"MAX(CASE WHEN {v} <= b.hi THEN {v} END) AS upperfence, AVG({v}) AS mean, "
+                f"SUM({v} < b.lo OR {v} > b.hi) AS outliers "
+                f"FROM {t} JOIN b ON {c} = b.grp WHERE {v} IS NOT NULL GROUP BY b.grp;",
+                tuple(x for s in stats for x in (s[0], s[5], s[6])),
+            )
+        else:
+            fences = self.run(
+                f"SELECT NULL AS grp, MIN(CASE WHEN {v} >= ? THEN {v} END) AS lowerfence, "
+                f"MAX(CASE WHEN {v} <= ? THEN {v} END) AS upperfence, AVG({v}) AS mean, "
+                f"SUM({v} < ? OR {v} > ?) AS outliers FROM {t} WHERE {v} IS NOT NULL;",
+                (stats[0][5], stats[0][6], stats[0][5], stats[0][6]),
+            )
+        rows = list(fences.itertuples(index=False))
+        fences = {row.grp: row for row in rows} if cat_col else {stats[0][0]: rows[0]}
+        out = pd.DataFrame([
+            (g, n, q1, med, q3, fences[g].lowerfence, fences[g].upperfence, fences[g].mean, int(fences[g].outliers))
+            for g, n, q1, med, q3, _, _ in stats
+        ], columns=columns)
+        return out.sort_values("count", ascending=False).reset_index(drop=True)
+
+    def sample(self, table, columns, n=20000):
+        # Bernoulli sample of about n rows, for charts that need points (e.g.
+        # a violin's density estimate) but not all of them
+        every = max(1, math.ceil(self.row_count(table) / n))
+        cols = list(dict.fromkeys(c for c in columns if c))
+        return self.run(
+            f"SELECT {', '.join(quote(c) for c in cols)} FROM {quote(table)} WHERE abs(random()) % ? = 0;",
+            (every,), self.dtypes(table),
+        )
+
+    def read_columns(self, table, columns):
+        cols = list(dict.fromkeys(c for c in columns if c))
+        return self.run(f"SELECT {', '.join(quote(c) for c in cols)} FROM {quote(table)};", (), self.dtypes(table))
+
+    # ----------------- Table Joins -----------------
+    def has_column(self, table, col):
+        return any(c == col for c, _ in self.schema(table))
+
+    def _join_clause(self, left, right, key, how):
+        k = quote(key)
+        join = "JOIN" if how == "inner" else "LEFT JOIN"
+        clause = f"FROM {quote(left)} AS l {join} {quote(right)} AS r ON l.{k} = r.{k}"
+        if how == "anti":
+            clause += f" WHERE r.{k} IS NULL"
+        return clause
+
+    def join(self, left, right, key, how="inner", limit=100):
+        # same column layout as pd.merge(on=key): key first, clashing names
+        # suffixed with _x/_y; an anti join only returns the left side
+        if how not in ("inner", "left", "anti"):
+            raise ValueError(f"Unsupported join type: {how}")
+        left_cols = [c for c, _ in self.schema(left) if c != key]
+        right_cols = [] if how == "anti" else [c for c, _ in self.schema(right) if c != key]
+        clash = set(left_cols) & set(right_cols)
+        select = [f"l.{quote(key)} AS {quote(key)}"]
+        select += [f"l.{quote(c)} AS {quote(c + '_x' if c in clash else c)}" for c in left_cols]
+        select += [f"r.{quote(c)} AS {quote(c + '_y' if c in clash else c)}" for c in right_cols]
+        return self.run(
+            f"SELECT {', '.join(select)} {self._join_clause(left, right, key, how)} LIMIT ?;",
+            (int(limit),),
+        )
+
+    def join_counts(self, left, right, key):
+        k = quote(key)
+        res = self.run(
+            f"SELECT (SELECT COUNT(*) FROM {quote(left)}) AS left_rows, "
+            f"(SELECT COUNT(*) FROM {quote(right)}) AS right_rows, "
+            f"(SELECT COUNT(*) {self._join_clause(left, right, key, 'inner')}) AS matched_rows, "
+            f"(SELECT COUNT(*) FROM {quote(left)} AS l WHERE NOT EXISTS "
+            f"(SELECT 1 FROM {quote(right)} AS r WHERE r.{k} = l.{k})) AS left_only_rows;"
+        )
+        return {c: int(res[c].iloc[0]) for c in res.columns}
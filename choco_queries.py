@@ -0,0 +1,143 @@
+# ----------------- Predefined Queries -----------------
+# "rollup", where present, answers the same question from the precomputed
+# tables in choco_rollups; the app runs it instead of "sql".
+queries = {
+    "product_info": {
+        "count_products_per_brand": {
+            "question": "How many products are there per brand?",
+            "sql": "SELECT brand, COUNT(*) AS product_count FROM product_info GROUP BY brand;",
+            "rollup": "SELECT brand, product_count FROM rollup_brand ORDER BY brand;"
+        },
+        "count_unique_products_per_brand": {
+            "question": "How many unique products does each brand have?",
+            "sql": "SELECT brand, COUNT(DISTINCT product_name) AS unique_products FROM product_info GROUP BY brand;",
+            "rollup": "SELECT brand, unique_products FROM rollup_brand ORDER BY brand;"
+        },
+        "top5_brands_by_product_count": {
+            "question": "Which are the top 5 brands by product count?",
+            "sql": "SELECT brand, COUNT(*) AS product_count FROM product_info GROUP BY brand ORDER BY product_count DESC, brand LIMIT 5;",
+            "rollup": "SELECT brand, product_count FROM rollup_brand ORDER BY product_count DESC, brand LIMIT 5;"
+        },
+        "products_missing_name": {
+            "question": "Which products have missing product names?",
+            "sql": "SELECT * FROM product_info WHERE product_name IS NULL OR product_name = '';"
+        },
+        "unique_brand_count": {
+            "question": "How many unique brands are there?",
+            "sql": "SELECT COUNT(DISTINCT brand) AS unique_brands FROM product_info;",
+            "rollup": "SELECT COUNT(brand) AS unique_brands FROM rollup_brand;"
+        },
+        "products_code_starting_3": {
+            "question": "Which products have a code starting with '3'?",
+            "sql": "SELECT * FROM product_info WHERE product_code GLOB '3*';"
+        }
+    },
+
+    "nutrient_info": {
+        "top10_highest_energy": {
+            "question": "What are the top 10 products with the highest energy (kcal)?",
+            "sql": "SELECT product_code, energy_kcal_value FROM nutrient_info ORDER BY energy_kcal_value DESC LIMIT 10;"
+        },
+        "avg_sugars_per_nova": {
+            "question": "What is the average sugar content per nova-group?",
+            "sql": "SELECT nova_group, AVG(sugars_value) AS avg_sugars FROM nutrient_info GROUP BY nova_group;",
+            "rollup": "SELECT nova_group, avg_sugars FROM rollup_nova ORDER BY nova_group;"
+        },
+        "count_fat_gt20": {
+            "question": "How many products have fat content greater than 20g?",
+            "sql": "SELECT COUNT(*) AS high_fat_products FROM nutrient_info WHERE fat_value > 20;",
+            "rollup": "SELECT COALESCE(SUM(fat_gt20_count), 0) AS high_fat_products FROM rollup_nova;"
+        },
+        "avg_carbs_per_product": {
+            "question": "What is the average carbohydrate content per product?",
+            "sql": "SELECT AVG(carbohydrates_value) AS avg_carbs FROM nutrient_info;",
+            "rollup": "SELECT SUM(carbs_sum) / NULLIF(SUM(carbs_n), 0) AS avg_carbs FROM rollup_nova;"
+        },
+        "products_sodium_gt1g": {
+            "question": "Which products have sodium content greater than 1g?",
+            "sql": "SELECT product_code, sodium_value FROM nutrient_info WHERE sodium_value > 1;"
+        },
+        "count_nonzero_fvn": {
+            "question": "How many products have non-zero fruits/vegetables/nuts content?",
+            "sql": "SELECT COUNT(*) AS nonzero_fvn FROM nutrient_info WHERE fruits_vegetables_nuts_estimate_100g > 0;",
+            "rollup": "SELECT COALESCE(SUM(fvn_count), 0) AS nonzero_fvn FROM rollup_nova;"
+        },
+        "products_energy_gt500": {
+            "question": "Which products have energy greater than 500 kcal?",
+            "sql": "SELECT product_code, energy_kcal_value FROM nutrient_info WHERE energy_kcal_value > 500;"
+        }
+    },
+        
+
+    "derived_metrics": {
+        "count_per_calorie_category": {
+            "question": "How many products are there per calorie category?",
+            "sql": "SELECT calorie_category, COUNT(*) AS product_count FROM derived_metrics GROUP BY calorie_category;",
+            "rollup": "SELECT calorie_category, SUM(product_count) AS product_count FROM rollup_category GROUP BY calorie_category;"
+        },
+        "count_high_sugar": {
+            "question": "How many products are marked as High Sugar?",
+            "sql": "SELECT COUNT(*) AS high_sugar_count FROM derived_metrics WHERE sugar_category = 'High Sugar';",
+            "rollup": "SELECT COALESCE(SUM(product_count), 0) AS high_sugar_count FROM rollup_category WHERE sugar_category = 'High Sugar';"
+        },
+        "avg_ratio_high_calorie": {
+            "question": "What is the average sugar-to-carb ratio for High Calorie products?",
+            "sql": "SELECT AVG(sugar_to_carb_ratio) AS avg_ratio FROM derived_metrics WHERE calorie_category = 'High';",
+            "rollup": "SELECT SUM(ratio_sum) / NULLIF(SUM(ratio_n), 0) AS avg_ratio FROM rollup_category WHERE calorie_category = 'High';"
+        },
+        "high_calorie_and_high_sugar": {
+            "question": "Which products are both High Calorie and High Sugar?",
+            "sql": "SELECT * FROM derived_metrics WHERE calorie_category = 'High' AND sugar_category = 'High Sugar';"
+        },
+        "count_ultra_processed": {
+            "question": "How many products are marked as ultra-processed?",
+            "sql": "SELECT COUNT(*) AS ultra_processed_count FROM derived_metrics WHERE is_ultra_processed = 'Yes';",
+            "rollup": "SELECT COALESCE(SUM(product_count), 0) AS ultra_processed_count FROM rollup_category WHERE is_ultra_processed = 'Yes';"
+        },
+        "products_ratio_gt07": {
+            "question": "Which products have sugar-to-carb ratio greater than 0.7?",
+            "sql": "SELECT * FROM derived_metrics WHERE sugar_to_carb_ratio > 0.7;"
+        },
+        "avg_ratio_per_calorie_category": {
+            "question": "What is the average sugar-to-carb ratio per calorie category?",
+            "sql": "SELECT calorie_category, AVG(sugar_to_carb_ratio) AS avg_ratio FROM derived_metrics GROUP BY calorie_category;",
+            "rollup": "SELECT calorie_category, SUM(ratio_sum) / NULLIF(SUM(ratio_n), 0) AS avg_ratio FROM rollup_category GROUP BY calorie_category;"
+        }
+    },
+
+    "join_queries": {
+        "top5_brands_high_calorie": {
+            "question": "Which are the top 5 brands with the most High Calorie products?",
+            "sql": "SELECT p.brand, COUNT(*) AS high_calorie_count FROM product_info p JOIN derived_metrics d ON p.product_code = d.product_code WHERE d.calorie_category = 'High' GROUP BY p.brand ORDER BY high_calorie_count DESC, p.brand LIMIT 5;",
+            "rollup": "SELECT brand, high_calorie_count FROM rollup_brand WHERE high_calorie_count > 0 ORDER BY high_calorie_count DESC, brand LIMIT 5;"
+        },
+        "avg_energy_per_calorie_category": {
+            "question": "What is the average energy (kcal) for each calorie category?",
+            "sql": "SELECT d.calorie_category, AVG(n.energy_kcal_value) AS avg_energy FROM derived_metrics d JOIN nutrient_info n ON d.product_code = n.product_code GROUP BY d.calorie_category;",
+            "rollup": "SELECT calorie_category, SUM(energy_sum) / NULLIF(SUM(energy_n), 0) AS avg_energy FROM rollup_category GROUP BY calorie_category HAVING SUM(nutrient_rows) > 0;"
+        },
+        "ultra_processed_per_brand": {
+            "question": "How many ultra-processed products are there per brand?",
+            "sql": "SELECT p.brand, COUNT(*) AS ultra_processed_count FROM product_info p JOIN derived_metrics d ON p.product_code = d.product_code WHERE d.is_ultra_processed = 'Yes' GROUP BY p.brand;",
+            "rollup": "SELECT brand, ultra_processed_count FROM rollup_brand WHERE ultra_processed_count > 0 ORDER BY brand;"
+        },
+        "high_sugar_high_calorie_with_brand": {
+            "question": "Which products are both High Sugar and High Calorie, along with their brand?",
+            "sql": "SELECT p.brand, p.product_name FROM product_info p JOIN derived_metrics d ON p.product_code = d.product_code WHERE d.calorie_category = 'High' AND d.sugar_category = 'High Sugar';"
+        },
+        "avg_sugar_ultra_processed_per_brand": {
+            "question": "What is the average sugar content per brand for ultra-processed products?",
+            "sql": "SELECT p.brand, AVG(n.sugars_value) AS avg_sugar FROM product_info p JOIN nutrient_info n ON p.product_code = n.product_code JOIN derived_metrics d ON p.product_code = d.product_code WHERE d.is_ultra_processed = 'Yes' GROUP BY p.brand;",
+            "rollup": "SELECT brand, avg_sugar_ultra_processed AS avg_sugar FROM rollup_brand WHERE ultra_processed_nutrient_rows > 0 ORDER BY brand;"
+        },
+        "fvn_per_calorie_category": {
+            "question": "How many products with fruits/vegetables/nuts content exist in each calorie category?",
+            "sql": "SELECT d.calorie_category, COUNT(*) AS count_with_fvn FROM derived_metrics d JOIN nutrient_info n ON d.product_code = n.product_code WHERE n.fruits_vegetables_nuts_estimate_100g > 0 GROUP BY d.calorie_category;",
+            "rollup": "SELECT calorie_category, SUM(fvn_count) AS count_with_fvn FROM rollup_category GROUP BY calorie_category HAVING SUM(fvn_count) > 0;"
+        },
+        "top5_products_by_ratio": {
+            "question": "Which are the top 5 products by sugar-to-carb ratio, with their calorie and sugar category?",
+            "sql": "SELECT p.product_name, d.sugar_to_carb_ratio, d.calorie_category, d.sugar_category FROM product_info p JOIN derived_metrics d ON p.product_code = d.product_code ORDER BY d.sugar_to_carb_ratio DESC LIMIT 5;"
+        }
+    }
+}
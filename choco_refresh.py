@@ -0,0 +1,180 @@
+import argparse
+import math
+import sqlite3
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from choco_db import DB_PATH
+from choco_ingest import API_URL, DEFAULT_FIELDS, SearchClient, fetch_pages
+from choco_migrations import migrate
+from choco_metrics import recompute_in_db
+from choco_rollups import merge_keys, rebuild_rollups, refresh_rollups, rollup_keys, rollups_fresh
+from choco_snapshot import SNAPSHOT_DIR, maybe_publish
+from choco_transform import NUTRIENT_COLUMNS, PRODUCT_COLUMNS, content_hash, product_rows
+
+LISTING_FIELDS = "code,last_modified_t"
+# the listing is fetched page by page in parallel; a fixed order keeps the
+# pages from shifting between requests, which could skip products
+LISTING_SORT = "code"
+DETAIL_FIELDS = DEFAULT_FIELDS + ",last_modified_t"
+DETAIL_BATCH = 100
+
+
+# ----------------- Remote Listing -----------------
+def fetch_listing(client, concurrency=4, max_pages=None):
+    # code -> last_modified_t for every product the search returns; only two
+    # small fields per product, so the full listing stays cheap. Also returns
+    # whether the listing is complete: every page fetched (not cut short by
+    # max_pages) and at least as many products as the search's count.
+    first = client.fetch_page(1, fields=LISTING_FIELDS, sort_by=LISTING_SORT)
+    listing = {}
+    _add_to_listing(listing, first)
+    count = first.get("count", 0)
+    total = math.ceil(count / client.page_size)
+    complete = not max_pages or total <= max_pages
+    if not complete:
+        total = max_pages
+    for _, payload in fetch_pages(client, range(2, total + 1), concurrency,
+                                  fields=LISTING_FIELDS, sort_by=LISTING_SORT):
+        _add_to_listing(listing, payload)
+    return listing, complete and len(listing) >= count
+
+
+def _add_to_listing(listing, payload):
+    for product in payload.get("products", []):
+        if product.get("code"):
+            listing[product["code"]] = product.get("last_modified_t")
+
+
+def fetch_details(client, codes, concurrency=4):
+    # full records for the given codes, DETAIL_BATCH codes per request
+    codes = sorted(codes)
+    batches = [codes[i:i + DETAIL_BATCH] for i in range(0, len(codes), DETAIL_BATCH)]
+    details = {}
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(client.fetch_page, 1, code=",".join(batch), page_size=len(batch))
+                   for batch in batches]
+        for future in as_completed(futures):
+            for product in future.result().get("products", []):
+                details[product.get("code")] = product
+    return details
+
+
+# ----------------- Delta Computation -----------------
+def local_markers(conn):
+    return {code: (ts, digest) for code, ts, digest in
+            conn.execute("SELECT product_code, last_modified_t, content_hash FROM product_sync")}
+
+
+def local_codes(conn):
+    return {row[0] for row in conn.execute("SELECT product_code FROM product_info")}
+
+
+def plan_delta(listing, markers, codes):
+    # a product is stale when its timestamp moved or it was never synced
+    stale = {code for code, ts in listing.items()
+             if code not in markers or ts is None or markers[code][0] != ts}
+    removed = (codes | set(markers)) - set(listing)
+    return stale, removed
+
+
+# ----------------- Apply Changes -----------------
+def _placeholders(columns):
+    return ", ".join("?" * len(columns))
+
+
+def apply_delta(conn, details, markers, removed):
+    # Upserts only products whose stored content actually changed, recomputes
+    # derived_metrics and the affected rollup groups for exactly those rows and
+    # deletes removed products, all in one transaction.
+    # Returns (upserted, touched_markers, deleted).
+    now = int(time.time())
+    upserts, marker_rows, changed = [], [], []
+    for code, product in details.items():
+        marker = (product.get("last_modified_t"), content_hash(product))
+        old = markers.get(code)
+        if old == marker:
+            continue
+        marker_rows.append((code,) + marker + (now,))
+        # a bumped timestamp with identical content only moves the marker
+        if old is None or old[1] != marker[1]:
+            upserts.append(product_rows(product))
+            changed.append(code)
+
+    if not upserts and not marker_rows and not removed:
+        # nothing to write: leave the file untouched so caches stay valid
+        return 0, 0, 0
+
+    with conn:
+        fresh = rollups_fresh(conn)
+        before = rollup_keys(conn, changed + list(removed)) if fresh else None
+        conn.executemany(f"INSERT OR REPLACE INTO product_info ({', '.join(PRODUCT_COLUMNS)}) "
+                         f"VALUES ({_placeholders(PRODUCT_COLUMNS)})", [r[0] for r in upserts])
+        conn.executemany(f"INSERT OR REPLACE INTO nutrient_info ({', '.join(NUTRIENT_COLUMNS)}) "
+                         f"VALUES ({_placeholders(NUTRIENT_COLUMNS)})", [r[1] for r in upserts])
+        recompute_in_db(conn, changed)
+        conn.executemany("INSERT OR REPLACE INTO product_sync VALUES (?, ?, ?, ?)", marker_rows)
+        for table in ("derived_metrics", "nutrient_info", "product_info", "product_sync"):
+            conn.executemany(f"DELETE FROM {table} WHERE product_code = ?", [(c,) for c in removed])
+        if fresh:
+            refresh_rollups(conn, merge_keys(before, rollup_keys(conn, changed)))
+        else:
+            # written to outside the loaders since the last rebuild: start over
+            rebuild_rollups(conn)
+    return len(upserts), len(marker_rows), len(removed)
+
+
+def refresh(conn, client, concurrency=4, max_pages=None, max_delete_fraction=0.5, log=print):
+    migrate(conn)
+    listing, complete = fetch_listing(client, concurrency, max_pages)
+    markers = local_markers(conn)
+    codes = local_codes(conn)
+    stale, removed = plan_delta(listing, markers, codes)
+    log(f"{len(listing)} products listed, {len(stale)} new or modified, {len(removed)} gone")
+    if removed and not complete:
+        # products past the last fetched page, or skipped by a page that came
+        # back short, are unlisted, not gone
+        log(f"listing incomplete (cut short by max_pages or fewer products than the search's count): "
+            f"not deleting {len(removed)} unlisted products")
+        removed = set()
+
+    # a listing that came back short (API hiccup) must not wipe the database
+    if codes and len(removed) > max_delete_fraction * len(codes):
+        raise RuntimeError(f"refusing to delete {len(removed)} of {len(codes)} products; "
+                           f"raise --max-delete-fraction if this is expected")
+
+    details = fetch_details(client, stale, concurrency)
+    missing = stale - set(details)
+    if missing:
+        log(f"{len(missing)} listed products could not be fetched; they will be retried next run")
+    upserted, marked, deleted = apply_delta(conn, details, markers, removed)
+    log(f"upserted {upserted}, updated {marked} change markers, deleted {deleted}")
+    return upserted, marked, deleted
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Incrementally refresh chocolates.db from OpenFoodFacts.")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--base-url", default=API_URL)
+    parser.add_argument("--category", default="chocolate")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=5.0, help="max requests per second")
+    parser.add_argument("--max-pages", type=int, help="only for testing: fetch at most this many listing pages; "
+                        "deletions are skipped when the listing is cut short")
+    parser.add_argument("--max-delete-fraction", type=float, default=0.5)
+    parser.add_argument("--snapshot-dir", default=SNAPSHOT_DIR, help="republish the columnar snapshot on change ('' to skip)")
+    args = parser.parse_args(argv)
+
+    client = SearchClient(args.base_url, args.category, DETAIL_FIELDS, rate=args.rate)
+    conn = sqlite3.connect(args.db)
+    changes = refresh(conn, client, args.concurrency, args.max_pages, args.max_delete_fraction)
+    conn.close()
+    # any write changes the file's version stamp, which makes the old snapshot stale
+    if any(changes) and args.snapshot_dir:
+        maybe_publish(args.db, args.snapshot_dir)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,245 @@
+import argparse
+import sqlite3
+import sys
+
+from choco_db import DB_PATH
+from choco_queries import queries
+from choco_snapshot import SNAPSHOT_DIR, maybe_publish
+
+KEY_CHUNK = 100
+CODE_CHUNK = 500
+
+# ----------------- Rollup Definitions -----------------
+# Each rollup is a GROUP BY over the base tables: dimension columns (name ->
+# source expression), the FROM clause, the product_code expression used to
+# find the groups a product belongs to, and the measures. Averages that are
+# re-aggregated across several dimensions are stored as (sum, count) pairs.
+ROLLUPS = {
+    "rollup_brand": {
+        "dimensions": {"brand": "p.brand"},
+        "from": ("product_info p "
+                 "LEFT JOIN derived_metrics d ON d.product_code = p.product_code "
+                 "LEFT JOIN nutrient_info n ON n.product_code = p.product_code"),
+        "code": "p.product_code",
+        "measures": {
+            "product_count": "COUNT(*)",
+            "unique_products": "COUNT(DISTINCT p.product_name)",
+            "high_calorie_count": "COUNT(CASE WHEN d.calorie_category = 'High' THEN 1 END)",
+            "ultra_processed_count": "COUNT(CASE WHEN d.is_ultra_processed = 'Yes' THEN 1 END)",
+            "ultra_processed_nutrient_rows": "COUNT(CASE WHEN d.is_ultra_processed = 'Yes' THEN n.product_code END)",
+            "avg_sugar_ultra_processed": "AVG(CASE WHEN d.is_ultra_processed = 'Yes' THEN n.sugars_value END)",
+        },
+    },
+    "rollup_nova": {
+        "dimensions": {"nova_group": "nova_group"},
+        "from": "nutrient_info",
+        "code": "product_code",
+        "measures": {
+            "product_count": "COUNT(*)",
+            "avg_sugars": "AVG(sugars_value)",
+            "carbs_sum": "TOTAL(carbohydrates_value)",
+            "carbs_n": "COUNT(carbohydrates_value)",
+            "fat_gt20_count": "COUNT(CASE WHEN fat_value > 20 THEN 1 END)",
+            "fvn_count": "COUNT(CASE WHEN fruits_vegetables_nuts_estimate_100g > 0 THEN 1 END)",
+        },
+    },
+    "rollup_category": {
+        "dimensions": {"calorie_category": "d.calorie_category",
+                       "sugar_category": "d.sugar_category",
+                       "is_ultra_processed": "d.is_ultra_processed"},
+        "from": "derived_metrics d LEFT JOIN nutrient_info n ON n.product_code = d.product_code",
+        "code": "d.product_code",
+        "measures": {
+            "product_count": "COUNT(*)",
+            "ratio_sum": "TOTAL(d.sugar_to_carb_ratio)",
+            "ratio_n": "COUNT(d.sugar_to_carb_ratio)",
+            "nutrient_rows": "COUNT(n.product_code)",
+            "energy_sum": "TOTAL(n.energy_kcal_value)",
+            "energy_n": "COUNT(n.energy_kcal_value)",
+            "fvn_count": "COUNT(CASE WHEN n.fruits_vegetables_nuts_estimate_100g > 0 THEN 1 END)",
+        },
+    },
+}
+
+
+def _columns(rollup):
+    return list(rollup["dimensions"]) + list(rollup["measures"])
+
+
+def _select_sql(rollup, where=""):
+    dims = ", ".join(f"{expr} AS {name}" for name, expr in rollup["dimensions"].items())
+    measures = ", ".join(f"{expr} AS {name}" for name, expr in rollup["measures"].items())
+    return (f"SELECT {dims}, {measures} FROM {rollup['from']} {where} "
+            f"GROUP BY {', '.join(rollup['dimensions'].values())}")
+
+
+def _key_filter(exprs, n_keys):
+    # IS rather than = so NULL groups (e.g. products without a brand) match
+    one = " AND ".join(f"{expr} IS ?" for expr in exprs)
+    return " OR ".join([f"({one})"] * n_keys)
+
+
+# ----------------- Schema -----------------
+# Columns are left untyped so values are stored exactly as the aggregate
+# produced them.
+ROLLUP_SCHEMA = [f"CREATE TABLE IF NOT EXISTS {name} ({', '.join(_columns(rollup))})"
+                 for name, rollup in ROLLUPS.items()]
+
+
+def rebuild_statements(names=ROLLUPS):
+    statements = []
+    for name in names:
+        rollup = ROLLUPS[name]
+        statements.append(f"DELETE FROM {name}")
+        statements.append(f"INSERT INTO {name} ({', '.join(_columns(rollup))}) {_select_sql(rollup)}")
+    return statements
+
+
+# ----------------- Freshness -----------------
+# rollup_state.fresh says whether the rollups match the base tables. Triggers
+# on the base tables clear it on any write, and rebuild_rollups/refresh_rollups
+# set it again in the same transaction, so rows written any other way (the
+# notebook, an ad-hoc script) leave the rollups marked stale and readers fall
+# back to the base queries. Replacing a table drops its triggers, which
+# rollups_fresh also treats as stale.
+FRESHNESS_VERSION = 5  # the schema version that adds rollup_state
+BASE_TABLES = ("product_info", "nutrient_info", "derived_metrics")
+STALE_TRIGGERS = {
+    f"rollup_stale_{table}_{op.lower()}":
+        f"CREATE TRIGGER IF NOT EXISTS rollup_stale_{table}_{op.lower()} AFTER {op} ON {table} "
+        f"WHEN (SELECT fresh FROM rollup_state) BEGIN UPDATE rollup_state SET fresh = 0; END"
+    for table in BASE_TABLES for op in ("INSERT", "UPDATE", "DELETE")
+}
+FRESHNESS_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS rollup_state (id INTEGER PRIMARY KEY CHECK (id = 1), fresh INTEGER NOT NULL)",
+    "INSERT OR IGNORE INTO rollup_state (id, fresh) VALUES (1, 0)",
+] + list(STALE_TRIGGERS.values())
+MARK_FRESH = "UPDATE rollup_state SET fresh = 1"
+
+
+def _tracks_freshness(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0] >= FRESHNESS_VERSION
+
+
+def rollups_fresh(conn):
+    # True when the rollup SQL may be served instead of the base SQL
+    if not _tracks_freshness(conn):
+        return False
+    triggers = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")}
+    if not set(STALE_TRIGGERS) <= triggers:
+        return False
+    row = conn.execute("SELECT fresh FROM rollup_state").fetchone()
+    return bool(row and row[0])
+
+
+def drop_stale_triggers(conn):
+    # for bulk loads, where a trigger per inserted row doubles the insert
+    # cost; rebuild_rollups puts them back. Runs in the caller's transaction.
+    if not _tracks_freshness(conn):
+        return
+    conn.execute("UPDATE rollup_state SET fresh = 0")
+    for name in STALE_TRIGGERS:
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+
+# ----------------- Maintenance -----------------
+def rebuild_rollups(conn, names=ROLLUPS):
+    # full rebuild after a bulk load; runs in the caller's transaction
+    for stmt in rebuild_statements(names):
+        conn.execute(stmt)
+    if set(names) == set(ROLLUPS) and _tracks_freshness(conn):
+        for ddl in STALE_TRIGGERS.values():
+            conn.execute(ddl)
+        conn.execute(MARK_FRESH)
+
+
+def rollup_keys(conn, codes):
+    # rollup name -> set of group keys the given products currently fall in.
+    # Collect once before and once after changing rows, then refresh the union.
+    codes = list(codes)
+    keys = {name: set() for name in ROLLUPS}
+    for name, rollup in ROLLUPS.items():
+        exprs = ", ".join(rollup["dimensions"].values())
+        for i in range(0, len(codes), CODE_CHUNK):
+            part = codes[i:i + CODE_CHUNK]
+            keys[name].update(conn.execute(
+                f"SELECT DISTINCT {exprs} FROM {rollup['from']} "
+                f"WHERE {rollup['code']} IN ({', '.join('?' * len(part))})", part))
+    return keys
+
+
+def merge_keys(*key_sets):
+    merged = {name: set() for name in ROLLUPS}
+    for keys in key_sets:
+        for name, values in keys.items():
+            merged[name] |= values
+    return merged
+
+
+def refresh_rollups(conn, keys):
+    # recomputes only the affected groups; runs in the caller's transaction.
+    # Only valid when rollups_fresh() held before the caller's changes.
+    for name, values in keys.items():
+        rollup = ROLLUPS[name]
+        values = sorted(values, key=repr)
+        for i in range(0, len(values), KEY_CHUNK):
+            part = values[i:i + KEY_CHUNK]
+            params = [v for key in part for v in key]
+            conn.execute(f"DELETE FROM {name} WHERE {_key_filter(rollup['dimensions'], len(part))}", params)
+            where = f"WHERE {_key_filter(rollup['dimensions'].values(), len(part))}"
+            conn.execute(f"INSERT INTO {name} ({', '.join(_columns(rollup))}) {_select_sql(rollup, where)}",
+                         params)
+    if _tracks_freshness(conn):
+        conn.execute(MARK_FRESH)
+
+
+# ----------------- Consistency Check -----------------
+def check_rollups(conn, catalog=queries):
+    # runs every predefined query both ways and returns the keys that differ
+    mismatches = []
+    for category, entries in catalog.items():
+        for key, query in entries.items():
+            if "rollup" not in query:
+                continue
+            base = conn.execute(query["sql"]).fetchall()
+            served = conn.execute(query["rollup"]).fetchall()
+            if _normalise(base) != _normalise(served):
+                mismatches.append(f"{category}.{key}")
+    return mismatches
+
+
+def _normalise(rows):
+    # group order is not part of the queries' contract and float sums may
+    # differ in the last bits depending on summation order
+    return sorted((tuple(round(v, 9) if isinstance(v, float) else v for v in row) for row in rows), key=repr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain the rollup tables in chocolates.db.")
+    parser.add_argument("command", choices=["rebuild", "check"])
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--snapshot-dir", default=SNAPSHOT_DIR,
+                        help="republish the columnar snapshot after a rebuild ('' to skip)")
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(args.db)
+    if args.command == "rebuild":
+        with conn:
+            rebuild_rollups(conn)
+        conn.close()
+        print(f"rebuilt {', '.join(ROLLUPS)}")
+        # the rebuild changes the file's version stamp, which retires the snapshot
+        if args.snapshot_dir:
+            maybe_publish(args.db, args.snapshot_dir)
+        return 0
+    if not rollups_fresh(conn):
+        print("rollups are not marked fresh; readers use the base queries until `rebuild`")
+    mismatches = check_rollups(conn)
+    for name in mismatches:
+        print(f"FAIL {name}: rollup result differs from the base query")
+    print(f"{len(mismatches)} mismatch(es)")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
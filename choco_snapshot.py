@@ -0,0 +1,153 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from uuid import uuid4
+
+from choco_db import DB_PATH, connect_readonly, db_version
+from choco_dtypes import apply_dtypes, table_dtypes
+from choco_export import arrow_column, arrow_schema, iter_chunks, table_columns
+
+SNAPSHOT_DIR = "snapshot"
+SNAPSHOT_TABLES = ["product_info", "nutrient_info", "derived_metrics"]
+KEEP_SNAPSHOTS = 2
+MAX_FRAMES = 16  # converted column sets held per snapshot
+
+
+# ----------------- Publishing -----------------
+# Each snapshot is a directory of uncompressed Arrow IPC (Feather v2) files,
+# which can be memory-mapped and read without decoding. CURRENT names the
+# live directory and is replaced atomically, so readers never see a partial one.
+def publish_snapshot(db_path=DB_PATH, out_dir=SNAPSHOT_DIR, tables=SNAPSHOT_TABLES, chunk_size=65536):
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    conn = connect_readonly(db_path)
+    try:
+        # read everything in one transaction so the tables are mutually consistent
+        conn.execute("BEGIN")
+        stamp = db_version(db_path)
+        # the suffix keeps two publishes in the same second (e.g. a rebuild
+        # followed by a republish) from colliding
+        name = f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}-{uuid4().hex[:8]}"
+        target = out_dir / name
+        target.mkdir()
+        rows = {}
+        for table in tables:
+            declared = dict(table_columns(conn, table))
+            columns = list(declared)
+            schema = arrow_schema(pa, columns, [], declared)
+            n = 0
+            with ipc.new_file(str(target / f"{table}.arrow"), schema) as writer:
+                for _, chunk in iter_chunks(conn, f"SELECT * FROM {table}", chunk_size=chunk_size):
+                    arrays = [arrow_column(pa, [r[i] for r in chunk], schema.field(i)) for i in range(len(columns))]
+                    writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+                    n += len(chunk)
+            rows[table] = n
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+
+    manifest = {"db_path": str(db_path), "db_version": list(stamp), "rows": rows, "created_at": int(time.time())}
+    (target / "manifest.json").write_text(json.dumps(manifest, indent=2))
+    tmp = out_dir / "CURRENT.tmp"
+    tmp.write_text(name)
+    os.replace(tmp, out_dir / "CURRENT")
+    _prune(out_dir, keep=name)
+    return target
+
+
+def _prune(out_dir, keep):
+    # open memory maps keep deleted files alive, so old readers are unaffected
+    dirs = sorted((p for p in out_dir.iterdir() if p.is_dir()), key=lambda p: (p.stat().st_mtime, p.name))
+    for old in [d for d in dirs if d.name != keep][:-(KEEP_SNAPSHOTS - 1) or None]:
+        shutil.rmtree(old, ignore_errors=True)
+
+
+# ----------------- Reading -----------------
+class ColumnarSnapshot:
+    def __init__(self, out_dir=SNAPSHOT_DIR, name=None):
+        # name: a snapshot directory, e.g. from current_snapshot_name();
+        # defaults to the one CURRENT points at
+        import pyarrow as pa
+        import pyarrow.ipc as ipc
+
+        self._pa, self._ipc = pa, ipc
+        out_dir = Path(out_dir)
+        self.dir = out_dir / (name or (out_dir / "CURRENT").read_text().strip())
+        self.manifest = json.loads((self.dir / "manifest.json").read_text())
+        self._tables = {}
+        self._frames = OrderedDict()
+        self._lock = threading.Lock()
+
+    def is_current(self, db_path=DB_PATH):
+        return tuple(self.manifest["db_version"]) == db_version(db_path)
+
+    def table(self, name):
+        # memory-mapped, zero-copy: pages are shared by every session and
+        # process that maps the same file
+        with self._lock:
+            if name not in self._tables:
+                source = self._pa.memory_map(str(self.dir / f"{name}.arrow"), "r")
+                self._tables[name] = self._ipc.open_file(source).read_all()
+            return self._tables[name]
+
+    def read_columns(self, name, columns):
+        # Arrow -> pandas copies the selected columns once; the converted
+        # frame is kept per column set, so reruns and other sessions sharing
+        # this snapshot reuse it. Shared like QueryCache results: callers
+        # must not mutate it.
+        cols = list(dict.fromkeys(c for c in columns if c))
+        key = (name, tuple(cols))
+        with self._lock:
+            if key in self._frames:
+                self._frames.move_to_end(key)
+                return self._frames[key]
+        selected = self.table(name).select(cols)
+        # Arrow type names ("double", "int64") map onto the same dtype rules
+        dtypes = table_dtypes((f.name, str(f.type)) for f in selected.schema)
+        df = apply_dtypes(selected.to_pandas(), dtypes)
+        with self._lock:
+            self._frames[key] = df
+            while len(self._frames) > MAX_FRAMES:
+                self._frames.popitem(last=False)
+        return df
+
+
+def current_snapshot_name(out_dir=SNAPSHOT_DIR):
+    try:
+        return (Path(out_dir) / "CURRENT").read_text().strip()
+    except FileNotFoundError:
+        return None
+
+
+def maybe_publish(db_path=DB_PATH, out_dir=SNAPSHOT_DIR, log=print):
+    # loaders call this after changing the database; pyarrow is optional
+    try:
+        target = publish_snapshot(db_path, out_dir)
+    except ImportError:
+        log("pyarrow not installed; columnar snapshot not published")
+        return None
+    log(f"published columnar snapshot {target}")
+    return target
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Publish a memory-mappable Arrow snapshot of chocolates.db.")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--out-dir", default=SNAPSHOT_DIR)
+    args = parser.parse_args(argv)
+    target = publish_snapshot(args.db, args.out_dir)
+    print(json.loads((target / "manifest.json").read_text()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,150 @@
+import argparse
+import json
+import random
+import sys
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+SEARCH_PATH = "/api/v2/search"
+
+
+# ----------------- Stub Search API -----------------
+# A local stand-in for the OpenFoodFacts v2 search endpoint, for exercising
+# choco_ingest without the network: a fixed, deterministic product set, plus
+# injected 503s (random via fail_rate, or a set number per page via
+# fail_pages) to drive the retry and resume paths.
+def stub_product(i):
+    kcal, sugars = 400 + i % 200, round(20 + (i % 50) * 0.7, 1)
+    return {
+        "code": f"{3000000000000 + i:013d}",
+        "last_modified_t": 1700000000 + i,
+        "product_name": f"Stub chocolate {i}",
+        "brands": f"Brand {i % 17}",
+        # like the real API: each nutrient both bare and per 100 g
+        "nutriments": {"energy-kcal": kcal, "energy-kcal_100g": kcal, "sugars": sugars, "sugars_100g": sugars,
+                       "carbohydrates": sugars + 10, "carbohydrates_100g": sugars + 10},
+    }
+
+
+class StubSearchServer:
+    def __init__(self, n_products=1234, fail_rate=0.0, fail_pages=None, retry_after=None,
+                 seed=0, host="127.0.0.1", port=0):
+        self.n_products = n_products
+        self.fail_rate = fail_rate
+        self.fail_pages = dict(fail_pages or {})  # page -> failures left before it succeeds
+        self.retry_after = retry_after
+        self.overrides = {}  # product index -> fields replacing the generated ones
+        self.served = Counter()  # page -> successful responses
+        self.failed = Counter()  # page -> 503 responses
+        self.detail_lookups = []  # codes asked for by each detail lookup
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}{SEARCH_PATH}"
+
+    def _should_fail(self, page):
+        with self._lock:
+            if self.fail_pages.get(page, 0) > 0:
+                self.fail_pages[page] -= 1
+                fail = True
+            else:
+                fail = self._random.random() < self.fail_rate
+            (self.failed if fail else self.served)[page] += 1
+            return fail
+
+    def product(self, i):
+        return {**stub_product(i), **self.overrides.get(i, {})}
+
+    def search(self, query):
+        page = int(query.get("page", ["1"])[0])
+        page_size = int(query.get("page_size", ["24"])[0])
+        fields = query.get("fields", [""])[0].split(",")
+        start = (page - 1) * page_size
+        products = [self.product(i) for i in range(start, min(start + page_size, self.n_products))]
+        if "code" in query:
+            # detail lookups by a comma-separated list of codes
+            codes = set(query["code"][0].split(","))
+            with self._lock:
+                self.detail_lookups.append(codes)
+            products = [p for p in map(self.product, range(self.n_products)) if p["code"] in codes]
+        if fields != [""]:
+            products = [{k: p[k] for k in fields if k in p} for p in products]
+        return {"count": self.n_products, "page": page, "page_size": page_size, "products": products}
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path != SEARCH_PATH:
+                    self.send_error(404)
+                    return
+                query = parse_qs(url.query)
+                if server._should_fail(int(query.get("page", ["1"])[0])):
+                    self.send_response(503)
+                    if server.retry_after is not None:
+                        self.send_header("Retry-After", str(server.retry_after))
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                body = json.dumps(server.search(query)).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a stub OpenFoodFacts search API for choco_ingest.")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--products", type=int, default=1234)
+    parser.add_argument("--fail-rate", type=float, default=0.3, help="fraction of requests answered with 503")
+    parser.add_argument("--retry-after", type=int, help="Retry-After seconds sent with each 503")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    server = StubSearchServer(args.products, args.fail_rate, retry_after=args.retry_after,
+                              seed=args.seed, port=args.port)
+    print(f"Serving {args.products} products at {server.url} (fail rate {args.fail_rate:.0%}); Ctrl+C to stop")
+    print(f"  python choco_ingest.py --base-url {server.url} --out-dir ingest_stub")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
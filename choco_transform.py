@@ -0,0 +1,58 @@
+import hashlib
+import json
+import math
+
+# ----------------- OpenFoodFacts -> Table Columns -----------------
+# (nutriments key, nutrient_info column), in table column order
+NUTRIENT_FIELDS = [
+    ("energy-kcal", "energy_kcal_value"),
+    ("energy-kj", "energy_kj_value"),
+    ("carbohydrates", "carbohydrates_value"),
+    ("sugars", "sugars_value"),
+    ("fat", "fat_value"),
+    ("saturated-fat", "saturated_fat_value"),
+    ("proteins", "proteins_value"),
+    ("fiber", "fiber_value"),
+    ("salt", "salt_value"),
+    ("sodium", "sodium_value"),
+    ("fruits-vegetables-nuts-estimate-from-ingredients", "fruits_vegetables_nuts_estimate_100g"),
+    ("nutrition-score-fr", "nutrition_score_fr"),
+    ("nova-group", "nova_group"),
+]
+
+PRODUCT_COLUMNS = ["product_code", "product_name", "brand"]
+NUTRIENT_COLUMNS = ["product_code"] + [col for _, col in NUTRIENT_FIELDS]
+DERIVED_COLUMNS = ["product_code", "sugar_to_carb_ratio", "calorie_category", "sugar_category", "is_ultra_processed"]
+
+
+def to_number(value):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(value) else value
+
+
+# ----------------- Per-Product Rows -----------------
+def product_rows(product):
+    code = product.get("code")
+    nutriments = product.get("nutriments") or {}
+    nutrients = {col: to_number(nutriments.get(key)) for key, col in NUTRIENT_FIELDS}
+    for col in ("nutrition_score_fr", "nova_group"):
+        if nutrients[col] is not None:
+            nutrients[col] = int(nutrients[col])
+    # derived_metrics rows are computed from nutrient_info by choco_metrics
+    return (
+        (code, product.get("product_name"), product.get("brands")),
+        (code,) + tuple(nutrients[col] for _, col in NUTRIENT_FIELDS),
+    )
+
+
+def content_hash(product):
+    # stable digest of everything we store, used as a change marker
+    payload = {
+        "product_name": product.get("product_name"),
+        "brands": product.get("brands"),
+        "nutriments": {key: (product.get("nutriments") or {}).get(key) for key, _ in NUTRIENT_FIELDS},
+    }
+    return hashlib.sha1(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
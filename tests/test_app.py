@@ -0,0 +1,62 @@
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("streamlit")
+from streamlit.testing.v1 import AppTest
+
+from choco_migrations import migrate
+
+APP = str(Path(__file__).resolve().parent.parent / "choco_analysis.py")
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    # the app opens chocolates.db (and writes its logs) in the working directory
+    monkeypatch.chdir(tmp_path)
+    conn = sqlite3.connect("chocolates.db")
+    migrate(conn)
+    with conn:
+        conn.executemany("INSERT INTO product_info VALUES (?, ?, ?)",
+                         [(f"{i:013d}", f"Choco {i}", f"Brand {i % 3}") for i in range(20)])
+        conn.executemany("INSERT INTO nutrient_info (product_code, energy_kcal_value, sugars_value) VALUES (?, ?, ?)",
+                         [(f"{i:013d}", 500 + i, 40 + i) for i in range(20)])
+    conn.close()
+    at = AppTest.from_file(APP, default_timeout=30)
+    at.run()
+    return at
+
+
+def test_console_select_star_join_with_repeated_columns(app):
+    app.radio(key="active_page").set_value("🧪 SQL Console").run()
+    app.text_area(key="console_sql").input(
+        "SELECT * FROM product_info p JOIN nutrient_info n ON p.product_code = n.product_code LIMIT 5"
+    ).run()
+    app.button(key="console_run").click().run()
+    assert not app.exception
+    df = app.dataframe[0].value
+    assert len(df) == 5 and df.columns.is_unique
+    assert ["product_code", "product_code.1"] == [c for c in df.columns if c.startswith("product_code")]
+    app.run()  # the stored result is shown again on every rerun
+    assert not app.exception
+
+
+
+def test_perf_clear_only_resets_this_session(app):
+    app.radio(key="active_page").set_value("🧪 SQL Console").run()
+    app.text_area(key="console_sql").input("SELECT 42 AS marker").run()
+    app.button(key="console_run").click().run()
+    app.sidebar.checkbox(key="perf_panel").check().run()
+    app.sidebar.button(key="perf_clear").click().run()
+    assert not app.exception
+
+    def event_names(at):
+        return at.sidebar.dataframe[-1].value["name"].tolist()
+
+    assert "SELECT 42 AS marker" not in event_names(app)
+    # the recorder is shared: another session still sees the event
+    other = AppTest.from_file(APP, default_timeout=30)
+    other.run()
+    other.sidebar.checkbox(key="perf_panel").check().run()
+    assert "SELECT 42 AS marker" in event_names(other)
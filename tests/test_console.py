@@ -0,0 +1,101 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("pandas")
+
+import choco_console
+from choco_console import QueryCancelled, is_heavy, run_guarded
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:", check_same_thread=False)
+    conn.execute("CREATE TABLE product_info (product_code TEXT PRIMARY KEY, product_name TEXT, brand TEXT)")
+    conn.execute("CREATE INDEX idx_product_brand ON product_info (brand, product_name)")
+    conn.executemany("INSERT INTO product_info VALUES (?, ?, ?)",
+                     [(f"{i:013d}", f"Choco {i}", f"Brand {i % 50}") for i in range(200_000)])
+    return conn
+
+
+def test_index_scans_count_as_heavy(conn):
+    assert is_heavy(conn, "SELECT brand, COUNT(*) FROM product_info GROUP BY brand")
+    assert is_heavy(conn, "SELECT * FROM product_info ORDER BY brand LIMIT 5")
+    assert not is_heavy(conn, "SELECT * FROM product_info WHERE product_code = '0000000000007'")
+
+
+def test_bounded_limit_runs_without_a_slot(conn, monkeypatch):
+    monkeypatch.setattr(choco_console, "_heavy_slots", threading.BoundedSemaphore(1))
+    assert choco_console._heavy_slots.acquire()  # every slot taken
+    result = run_guarded(conn, "SELECT * FROM product_info LIMIT 5")
+    assert len(result["rows"]) == 5 and not result["heavy"]
+
+
+def test_full_scan_needs_a_slot(conn, monkeypatch):
+    monkeypatch.setattr(choco_console, "_heavy_slots", threading.BoundedSemaphore(1))
+    monkeypatch.setattr(choco_console, "HEAVY_WAIT_S", 0.1)
+    sql = "SELECT brand, COUNT(*) FROM product_info GROUP BY brand"
+    assert run_guarded(conn, sql)["heavy"]
+    choco_console._heavy_slots.acquire()
+    with pytest.raises(RuntimeError, match="already running"):
+        run_guarded(conn, sql)
+    # a LIMIT that doesn't stop the scan early (unindexed filter) still needs one
+    with pytest.raises(RuntimeError, match="already running"):
+        run_guarded(conn, "SELECT * FROM product_info WHERE product_name = 'none' LIMIT 5")
+
+
+def test_slot_wait_does_not_count_against_the_budget(conn, monkeypatch):
+    slots = threading.BoundedSemaphore(1)
+    monkeypatch.setattr(choco_console, "_heavy_slots", slots)
+    slots.acquire()
+    threading.Timer(0.5, slots.release).start()
+    result = run_guarded(conn, "SELECT brand, COUNT(*) FROM product_info GROUP BY brand", budget=0.4)
+    assert result["heavy"] and len(result["rows"]) == 50
+
+
+def test_cancel_and_timeout(conn):
+    slow = ("WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) "
+            "SELECT COUNT(*) FROM n, product_info")
+    with pytest.raises(TimeoutError):
+        run_guarded(conn, slow, budget=0.2)
+    cancel = threading.Event()
+    threading.Timer(0.2, cancel.set).start()
+    start = time.monotonic()
+    with pytest.raises(QueryCancelled):
+        run_guarded(conn, slow, cancel=cancel)
+    assert time.monotonic() - start < 5
+
+
+def test_writes_are_rejected(conn):
+    with pytest.raises(ValueError, match="only SELECT"):
+        run_guarded(conn, "DELETE FROM product_info")
+
+
+def test_values_larger_than_the_byte_cap_are_refused(conn):
+    with pytest.raises(ValueError, match="not authorized"):
+        run_guarded(conn, "SELECT randomblob(999999999)")
+    with pytest.raises(ValueError, match="byte cap"):
+        run_guarded(conn, "SELECT group_concat(product_name) FROM product_info", max_bytes=1000)
+    # the connection's own limit is restored afterwards
+    assert len(conn.execute("SELECT group_concat(product_name) FROM product_info").fetchone()[0]) > 1000
+
+
+def test_submissions_are_turned_away_when_every_worker_is_busy(tmp_path, monkeypatch):
+    db_path = tmp_path / "chocolates.db"
+    db = sqlite3.connect(db_path)
+    db.execute("CREATE TABLE product_info (product_code TEXT PRIMARY KEY)")
+    db.close()
+    permits = threading.BoundedSemaphore(1)
+    monkeypatch.setattr(choco_console, "_worker_permits", permits)
+    permits.acquire()  # the only worker is busy
+    busy = choco_console.submit("SELECT 1", threading.Event(), db_path)
+    assert busy.done()
+    with pytest.raises(RuntimeError, match="already running"):
+        busy.result()
+    permits.release()
+    # the permit is taken and given back by a query that runs
+    result = choco_console.submit("SELECT 1 AS one", threading.Event(), db_path).result(timeout=5)
+    assert result["rows"] == [(1,)]
+    assert permits.acquire(blocking=False)
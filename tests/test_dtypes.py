@@ -0,0 +1,21 @@
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+from choco_dtypes import apply_dtypes
+
+
+def test_low_cardinality_text_becomes_category():
+    df = pd.DataFrame({"product_name": ["Dark", "Milk", "Dark", "White", "Milk", "Dark"],
+                       "product_code": [f"{i:013d}" for i in range(6)]})
+    compact = apply_dtypes(df, {})
+    assert str(compact["product_name"].dtype) == "category"
+    assert compact["product_name"].tolist() == df["product_name"].tolist()
+    # one distinct value per row: not worth a categorical
+    assert str(compact["product_code"].dtype) != "category"
+
+
+def test_object_text_becomes_category():
+    df = pd.DataFrame({"brand": pd.Series(["A", "B", "A", "A"], dtype=object)})
+    assert str(apply_dtypes(df, {}, auto_category=True)["brand"].dtype) == "category"
+    assert str(apply_dtypes(df, {}, auto_category=False)["brand"].dtype) == "object"
@@ -0,0 +1,71 @@
+import json
+
+import pytest
+
+pytest.importorskip("requests")
+
+from choco_ingest import PageStore, SearchClient, ingest, write_output
+from choco_stub_server import StubSearchServer
+
+N_PRODUCTS = 1234  # 13 pages of 100
+PAGE_SIZE = 100
+
+
+def make_client(server, retries=5):
+    # no rate limit and no backoff sleeps against the local stub
+    return SearchClient(server.url, page_size=PAGE_SIZE, rate=0, retries=retries, backoff=0.0, timeout=5)
+
+
+def read_codes(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line)["code"] for line in f]
+
+
+def test_transient_errors_are_retried(tmp_path):
+    with StubSearchServer(N_PRODUCTS, fail_rate=0.3, seed=1) as server:
+        store, last_page = ingest(make_client(server), tmp_path / "ingest", concurrency=4, log=lambda *a: None)
+        n = write_output(store, last_page, tmp_path / "chocolates.jsonl")
+
+    assert sum(server.failed.values()) > 0
+    assert last_page == 13
+    assert n == N_PRODUCTS
+    assert len(set(read_codes(tmp_path / "chocolates.jsonl"))) == N_PRODUCTS
+
+
+def test_interrupted_run_resumes_missing_pages(tmp_path):
+    out_dir = tmp_path / "ingest"
+    # page 7 fails once; without retries the first run stops there
+    with StubSearchServer(N_PRODUCTS, fail_pages={7: 1}) as server:
+        with pytest.raises(Exception, match="503"):
+            ingest(make_client(server, retries=0), out_dir, max_pages=13, concurrency=2, log=lambda *a: None)
+        on_disk = {p for p in range(1, 14) if PageStore(out_dir, make_client(server)).has_page(p)}
+        assert 7 not in on_disk
+
+        server.served.clear()
+        store, last_page = ingest(make_client(server), out_dir, concurrency=4, log=lambda *a: None)
+        n = write_output(store, last_page, tmp_path / "chocolates.jsonl")
+
+    # the rerun only asked for the pages the first run didn't write
+    assert set(server.served) == set(range(1, 14)) - on_disk
+    assert last_page == 13
+    assert n == N_PRODUCTS
+    assert len(set(read_codes(tmp_path / "chocolates.jsonl"))) == N_PRODUCTS
+
+
+def test_checkpoint_refuses_a_different_query(tmp_path):
+    with StubSearchServer(50) as server:
+        ingest(make_client(server), tmp_path, log=lambda *a: None)
+        other = SearchClient(server.url, category="candy", page_size=PAGE_SIZE, rate=0)
+        with pytest.raises(ValueError, match="different query"):
+            PageStore(tmp_path, other)
+
+
+def test_csv_output_keeps_one_row_per_code(tmp_path):
+    with StubSearchServer(250) as server:
+        store, last_page = ingest(make_client(server), tmp_path / "ingest", log=lambda *a: None)
+        n = write_output(store, last_page, tmp_path / "chocolates.csv")
+
+    lines = (tmp_path / "chocolates.csv").read_text(encoding="utf-8").splitlines()
+    assert n == 250
+    assert lines[0] == "code,product_name,brands,nutriments"
+    assert len(lines) == 251
@@ -0,0 +1,32 @@
+import sqlite3
+
+import pytest
+
+pytest.importorskip("pandas")
+
+from choco_load import bulk_load, compare, load_frames, row_by_row_load, synthetic_frames
+
+
+def table_rows(path, table):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(f"SELECT * FROM {table} ORDER BY product_code").fetchall()
+    finally:
+        conn.close()
+
+
+def test_compare_runs(capsys):
+    compare(300)
+    out = capsys.readouterr().out
+    assert "300 products x 3 tables" in out
+    assert "speed-up" in out
+
+
+def test_both_load_paths_write_the_same_rows(tmp_path):
+    frames = synthetic_frames(300)
+    row_by_row_load(tmp_path / "rows.db", *frames)
+    bulk_load(lambda conn, bs: load_frames(conn, *frames, bs), str(tmp_path / "bulk.db"), snapshot_dir=None)
+    for table in ["product_info", "nutrient_info", "derived_metrics"]:
+        rows = table_rows(tmp_path / "rows.db", table)
+        assert len(rows) == 300
+        assert rows == table_rows(tmp_path / "bulk.db", table)
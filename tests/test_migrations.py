@@ -0,0 +1,35 @@
+import sqlite3
+
+from choco_console import is_heavy
+from choco_migrations import check_query_plans, explain, full_scans, migrate
+
+AVG_CARBS = "SELECT AVG(carbohydrates_value) FROM nutrient_info"
+
+
+def make_conn():
+    conn = sqlite3.connect(":memory:")
+    migrate(conn)
+    return conn
+
+
+def test_covering_index_scan_is_a_full_scan():
+    conn = make_conn()
+    plan = explain(conn, AVG_CARBS)
+    assert any("COVERING INDEX" in detail for detail in plan)
+    assert full_scans(plan)
+    # the console and the checker agree
+    assert is_heavy(conn, AVG_CARBS)
+    assert not full_scans(explain(conn, "SELECT * FROM nutrient_info WHERE product_code = '1'"))
+
+
+def test_checker_flags_scans_unless_allowed():
+    catalog = {"nutrient_info": {
+        "avg_carbs_per_product": {"sql": AVG_CARBS},  # allowed as a rollup fallback, but has none here
+        "avg_sugars": {"sql": "SELECT AVG(sugars_value) FROM nutrient_info"},
+        "by_code": {"sql": "SELECT * FROM nutrient_info WHERE product_code = '1'"},
+    }}
+    problems = dict(check_query_plans(make_conn(), catalog))
+    assert set(problems) == {"nutrient_info.avg_carbs_per_product", "nutrient_info.avg_sugars"}
+    assert "no rollup" in problems["nutrient_info.avg_carbs_per_product"]
+    assert "COVERING INDEX" in problems["nutrient_info.avg_sugars"]
+    assert check_query_plans(make_conn()) == []
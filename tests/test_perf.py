@@ -0,0 +1,48 @@
+import json
+import time
+
+import choco_perf
+from choco_perf import PerfRecorder, logger, setup_logging, slow_logger
+
+
+def test_since_hides_earlier_events_without_clearing():
+    perf = PerfRecorder(slow_query_ms=10)
+    perf.record("query", "old", 1.0)
+    perf.log_slow_query("SELECT 1", (), 20.0)
+    since = time.time() + 0.01
+    time.sleep(0.02)
+    perf.record("query", "new", 2.0)
+    events, slow = perf.snapshot(since)
+    assert [e["name"] for e in events] == ["new"] and slow == []
+    assert perf.summary(since)["query"]["count"] == 1
+    # other sessions still see everything
+    assert len(perf.snapshot()[0]) == 2 and perf.summary()["query"]["count"] == 2
+
+
+def test_snapshot_reads_are_left_out_of_the_hit_rate():
+    perf = PerfRecorder()
+    perf.record("query", "a", 1.0, cache="hit")
+    perf.record("query", "b", 1.0, cache="miss")
+    perf.record("query", "c", 1.0, cache="snapshot")
+    assert perf.summary()["query"]["hit_rate"] == 0.5
+
+
+def test_logs_rotate(tmp_path, monkeypatch):
+    monkeypatch.setattr(choco_perf, "LOG_MAX_BYTES", 2000)
+    perf_log, slow_log = tmp_path / "perf.jsonl", tmp_path / "slow.jsonl"
+    setup_logging(str(perf_log), str(slow_log))
+    try:
+        perf = PerfRecorder()
+        for i in range(100):
+            perf.record("query", f"q{i}", 1.0)
+        for h in logger.handlers:
+            h.flush()
+        assert perf_log.stat().st_size <= 2000
+        assert (tmp_path / "perf.jsonl.1").exists()
+        assert json.loads(perf_log.read_text().splitlines()[-1])["name"] == "q99"
+    finally:
+        for log in (logger, slow_logger):
+            for h in list(log.handlers):
+                if str(tmp_path) in getattr(h, "baseFilename", ""):
+                    log.removeHandler(h)
+                    h.close()
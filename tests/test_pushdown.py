@@ -0,0 +1,68 @@
+import sqlite3
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+np = pytest.importorskip("numpy")
+
+import choco_pushdown
+from choco_db import ConnectionPool, QueryCache, stream_query
+from choco_pushdown import PushdownEngine
+
+
+def fill(conn, n=500):
+    conn.execute("CREATE TABLE t (a REAL, b REAL, c INTEGER, d REAL)")
+    rng = np.random.default_rng(1)
+    a = rng.normal(size=n)
+    rows = [(None if i % 7 == 0 else float(a[i]),
+             None if i % 5 == 0 else float(2 * a[i] + rng.normal()),
+             None if i % 3 == 0 else 1_700_000_000 + i,  # large INTEGERs, like timestamps
+             4.0)  # constant: no variance
+            for i in range(n)]
+    with conn:
+        conn.executemany("INSERT INTO t VALUES (?, ?, ?, ?)", rows)
+
+
+def make_engine():
+    conn = sqlite3.connect(":memory:")
+    fill(conn)
+    engine = PushdownEngine(lambda sql, params=(), dtypes=None: pd.read_sql_query(sql, conn, params=params),
+                            stream=lambda sql, params=(), chunk_rows=50_000: stream_query(conn, sql, params, chunk_rows))
+    return engine, conn
+
+
+def test_correlation_matches_pandas_across_chunks(monkeypatch):
+    monkeypatch.setattr(choco_pushdown, "CORR_CHUNK_ROWS", 64)
+    engine, conn = make_engine()
+    cols = ["a", "b", "c", "d"]
+    got = engine.correlation("t", cols)
+    want = pd.read_sql_query("SELECT a, b, c, d FROM t", conn).astype(float).corr()
+    pd.testing.assert_frame_equal(got, want, atol=1e-9)
+
+
+def test_ols_matches_polyfit():
+    engine, conn = make_engine()
+    fit = engine.ols("t", "c", "b").iloc[0]
+    df = pd.read_sql_query("SELECT c, b FROM t", conn).dropna()
+    slope, intercept = np.polyfit(df["c"], df["b"], 1)
+    assert fit["n"] == len(df)
+    assert fit["slope"] == pytest.approx(slope, rel=1e-6)
+    assert fit["intercept"] == pytest.approx(intercept, rel=1e-6)
+
+
+def test_cached_correlation_keeps_only_the_matrix(tmp_path, monkeypatch):
+    monkeypatch.setattr(choco_pushdown, "CORR_CHUNK_ROWS", 64)
+    path = str(tmp_path / "t.db")
+    conn = sqlite3.connect(path)
+    fill(conn)
+    conn.close()
+    events = []
+    cache = QueryCache(ConnectionPool(path), observer=lambda *args: events.append(args))
+    engine = PushdownEngine(cache.run, stream=cache.stream, memo=cache.memo)
+    first = engine.correlation("t", ["a", "b", "c"])
+    entries = cache.stats()["entries"]
+    # the pivots lookup and the 3x3 result, not the streamed chunks
+    assert entries == 2 and cache.stats()["bytes"] < 10_000
+    assert sum(1 for sql, *_ in events if sql.startswith("SELECT")) == 2  # pivots + one stream
+    assert engine.correlation("t", ["a", "b", "c"]) is first
+    assert cache.stats()["entries"] == entries
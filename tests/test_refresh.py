@@ -0,0 +1,110 @@
+import sqlite3
+
+import pytest
+
+pytest.importorskip("requests")
+pytest.importorskip("pandas")
+
+from choco_ingest import SearchClient
+from choco_refresh import DETAIL_FIELDS, LISTING_FIELDS, LISTING_SORT, refresh
+from choco_rollups import check_rollups, rollups_fresh
+from choco_stub_server import StubSearchServer, stub_product
+
+
+def make_client(server):
+    return SearchClient(server.url, fields=DETAIL_FIELDS, rate=0, retries=0, backoff=0.0, timeout=5)
+
+
+class ShortListingServer(StubSearchServer):
+    # drops one product from the listing pages, as if results shifted
+    # between page requests; detail lookups are unaffected
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.listing_sorts = set()
+
+    def search(self, query):
+        result = super().search(query)
+        if query.get("fields") == [LISTING_FIELDS]:
+            self.listing_sorts.update(query.get("sort_by", [None]))
+            if result["page"] == 2:
+                result["products"] = result["products"][1:]
+        return result
+
+
+def product_count(conn):
+    return conn.execute("SELECT COUNT(*) FROM product_info").fetchone()[0]
+
+
+def test_only_modified_products_are_fetched_and_upserted(tmp_path):
+    conn = sqlite3.connect(tmp_path / "chocolates.db")
+    changed, touched = stub_product(5), stub_product(8)
+    with StubSearchServer(250) as server:
+        assert refresh(conn, make_client(server), log=lambda *a: None) == (250, 250, 0)
+        assert conn.execute("SELECT sugar_category FROM derived_metrics WHERE product_code = ?",
+                            (changed["code"],)).fetchone() == ("High Sugar",)
+
+        # product 5: new timestamp and new content; product 8: new timestamp only
+        server.overrides[5] = {"last_modified_t": changed["last_modified_t"] + 60,
+                               "nutriments": {**changed["nutriments"], "sugars": 3.0, "sugars_100g": 3.0}}
+        server.overrides[8] = {"last_modified_t": touched["last_modified_t"] + 60}
+        server.detail_lookups.clear()
+        assert refresh(conn, make_client(server), log=lambda *a: None) == (1, 2, 0)
+        assert server.detail_lookups == [{changed["code"], touched["code"]}]
+
+        # nothing moved since: no detail lookups, no writes
+        server.detail_lookups.clear()
+        assert refresh(conn, make_client(server), log=lambda *a: None) == (0, 0, 0)
+        assert server.detail_lookups == []
+
+    assert conn.execute("SELECT n.sugars_value, d.sugar_category FROM nutrient_info n "
+                        "JOIN derived_metrics d USING (product_code) WHERE product_code = ?",
+                        (changed["code"],)).fetchone() == (3.0, "Low Sugar")
+    assert conn.execute("SELECT last_modified_t FROM product_sync WHERE product_code = ?",
+                        (touched["code"],)).fetchone() == (touched["last_modified_t"] + 60,)
+    assert product_count(conn) == 250
+    assert rollups_fresh(conn) and check_rollups(conn) == []
+
+
+def test_truncated_listing_does_not_delete(tmp_path):
+    conn = sqlite3.connect(tmp_path / "chocolates.db")
+    with StubSearchServer(450) as server:
+        assert refresh(conn, make_client(server), log=lambda *a: None) == (450, 450, 0)
+        # 2 of 5 listing pages: the other 250 products are unlisted, not gone
+        assert refresh(conn, make_client(server), max_pages=2, log=lambda *a: None) == (0, 0, 0)
+    assert product_count(conn) == 450
+
+
+def test_short_listing_does_not_delete(tmp_path):
+    conn = sqlite3.connect(tmp_path / "chocolates.db")
+    with StubSearchServer(450) as server:
+        refresh(conn, make_client(server), log=lambda *a: None)
+    with ShortListingServer(450) as server:
+        # 449 of 450 listed: the missing product was skipped, not removed
+        assert refresh(conn, make_client(server), log=lambda *a: None) == (0, 0, 0)
+    assert server.listing_sorts == {LISTING_SORT}
+    assert product_count(conn) == 450
+
+
+def test_full_listing_deletes_removed_products(tmp_path):
+    conn = sqlite3.connect(tmp_path / "chocolates.db")
+    with StubSearchServer(450) as server:
+        refresh(conn, make_client(server), log=lambda *a: None)
+    with StubSearchServer(420) as server:
+        assert refresh(conn, make_client(server), log=lambda *a: None) == (0, 0, 30)
+    assert product_count(conn) == 420
+    assert rollups_fresh(conn) and check_rollups(conn) == []
+
+
+def test_refresh_rebuilds_stale_rollups(tmp_path):
+    conn = sqlite3.connect(tmp_path / "chocolates.db")
+    with StubSearchServer(120) as server:
+        refresh(conn, make_client(server), log=lambda *a: None)
+        assert rollups_fresh(conn)
+        # a write from outside the refresher: the key-scoped refresh can't repair that
+        with conn:
+            conn.execute("DELETE FROM nutrient_info WHERE product_code IN "
+                         "(SELECT product_code FROM nutrient_info LIMIT 5)")
+        assert not rollups_fresh(conn)
+    with StubSearchServer(110) as server:
+        refresh(conn, make_client(server), log=lambda *a: None)
+    assert rollups_fresh(conn) and check_rollups(conn) == []
@@ -0,0 +1,80 @@
+import json
+import sqlite3
+
+import pytest
+
+pytest.importorskip("pandas")
+
+from choco_batch import run_batch
+from choco_migrations import migrate
+from choco_rollups import check_rollups, rebuild_rollups, rollups_fresh
+
+
+def make_db(path, n=60, target=None):
+    conn = sqlite3.connect(path)
+    migrate(conn) if target is None else migrate(conn, target=target)
+    with conn:
+        conn.executemany("INSERT INTO product_info VALUES (?, ?, ?)",
+                         [(f"{i:013d}", f"Choco {i}", f"Brand {i % 7}") for i in range(n)])
+        conn.executemany("INSERT INTO nutrient_info (product_code, energy_kcal_value, carbohydrates_value, "
+                         "sugars_value, fat_value, nova_group) VALUES (?, ?, ?, ?, ?, ?)",
+                         [(f"{i:013d}", 300 + i, 50 + i % 9, 20 + i % 30, 10 + i % 25, i % 4 + 1) for i in range(n)])
+        conn.executemany("INSERT INTO derived_metrics VALUES (?, ?, ?, ?, ?)",
+                         [(f"{i:013d}", (20 + i % 30) / (50 + i % 9), "High" if i % 3 else "Low",
+                           "High Sugar" if i % 2 else "Low Sugar", "Yes" if i % 4 == 1 else "No") for i in range(n)])
+        if target is None:
+            rebuild_rollups(conn)
+    return conn
+
+
+def batch_sources(db_path, out_dir):
+    _, manifest = run_batch(str(db_path), str(out_dir), "JSON Lines", categories=["product_info"],
+                            workers=2, log=lambda *a: None)
+    return manifest, {e["key"]: e["source"] for e in manifest["queries"]}
+
+
+def test_rebuild_marks_rollups_fresh(tmp_path):
+    conn = make_db(tmp_path / "chocolates.db")
+    assert rollups_fresh(conn)
+    assert check_rollups(conn) == []
+
+    manifest, sources = batch_sources(tmp_path / "chocolates.db", tmp_path / "out")
+    assert manifest["rollups_fresh"] and manifest["failed"] == 0
+    assert sources["count_products_per_brand"] == "rollup"
+
+
+def test_write_outside_the_loaders_marks_rollups_stale(tmp_path):
+    conn = make_db(tmp_path / "chocolates.db")
+    with conn:
+        conn.execute("INSERT INTO product_info VALUES ('9999999999999', 'Extra', 'Brand new')")
+    assert not rollups_fresh(conn)
+
+    manifest, sources = batch_sources(tmp_path / "chocolates.db", tmp_path / "out")
+    assert not manifest["rollups_fresh"] and manifest["failed"] == 0
+    assert set(sources.values()) == {"sql"}
+    with open(tmp_path / "out" / "product_info" / "count_products_per_brand.jsonl", encoding="utf-8") as f:
+        assert sum(json.loads(line)["product_count"] for line in f) == 61
+
+    with conn:
+        rebuild_rollups(conn)
+    assert rollups_fresh(conn)
+
+
+def test_replaced_table_marks_rollups_stale(tmp_path):
+    # e.g. DataFrame.to_sql(if_exists="replace"): the table's triggers go with it
+    conn = make_db(tmp_path / "chocolates.db")
+    with conn:
+        conn.execute("CREATE TABLE product_info_copy AS SELECT * FROM product_info")
+        conn.execute("DROP TABLE product_info")
+        conn.execute("ALTER TABLE product_info_copy RENAME TO product_info")
+    assert not rollups_fresh(conn)
+
+
+def test_unmigrated_database_uses_base_sql(tmp_path):
+    # the notebook's build path: schema version 0, no rollup tables
+    conn = make_db(tmp_path / "chocolates.db", target=0)
+    assert not rollups_fresh(conn)
+
+    manifest, sources = batch_sources(tmp_path / "chocolates.db", tmp_path / "out")
+    assert manifest["failed"] == 0
+    assert set(sources.values()) == {"sql"}
@@ -0,0 +1,37 @@
+import sqlite3
+
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from choco_migrations import migrate
+from choco_snapshot import KEEP_SNAPSHOTS, ColumnarSnapshot, current_snapshot_name, publish_snapshot
+
+
+def make_db(path, n=50):
+    conn = sqlite3.connect(path)
+    migrate(conn)
+    with conn:
+        conn.executemany("INSERT INTO product_info VALUES (?, ?, ?)",
+                         [(f"{i:013d}", f"Choco {i}", f"Brand {i % 3}") for i in range(n)])
+    conn.close()
+    return str(path)
+
+
+def test_back_to_back_publishes_get_distinct_directories(tmp_path):
+    db_path = make_db(tmp_path / "chocolates.db")
+    targets = [publish_snapshot(db_path, tmp_path / "snapshot") for _ in range(3)]
+    assert len({t.name for t in targets}) == 3
+    assert current_snapshot_name(tmp_path / "snapshot") == targets[-1].name
+    kept = [p.name for p in (tmp_path / "snapshot").iterdir() if p.is_dir()]
+    assert sorted(kept) == sorted(t.name for t in targets[-KEEP_SNAPSHOTS:])
+
+
+def test_read_columns_reuses_the_converted_frame(tmp_path):
+    db_path = make_db(tmp_path / "chocolates.db")
+    target = publish_snapshot(db_path, tmp_path / "snapshot")
+    snapshot = ColumnarSnapshot(tmp_path / "snapshot", name=target.name)
+    df = snapshot.read_columns("product_info", ["product_code", "brand", None])
+    assert list(df.columns) == ["product_code", "brand"] and len(df) == 50
+    assert snapshot.read_columns("product_info", ["product_code", "brand"]) is df
+    assert snapshot.read_columns("product_info", ["brand"]) is not df